@@ -0,0 +1,48 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Micro-benchmarks for the add-on's hot paths.
+
+Run a benchmark from the repository root, e.g.:
+
+    python -m benchmarks.bench_freq
+
+The Anki modules are stubbed the same way the unit tests do it.
+"""
+
+from time import perf_counter
+
+import tests  # noqa: F401
+
+
+def timed(func, *args, repeat=1):
+    """Return the best wall-clock time of `repeat` calls to func(*args)."""
+
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        func(*args)
+        elapsed = perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def report(name, n, seconds):
+    print('{:<40} {:>10,d} ops {:>10.4f} s {:>14,.0f} ops/s'.format(
+        name, n, seconds, n / seconds if seconds else float('inf')
+    ))
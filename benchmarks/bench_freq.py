@@ -0,0 +1,61 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Bulk frequency throughput: line-by-line regex scan vs. indexed lookup."""
+
+import re
+from os.path import join
+from random import Random
+
+from benchmarks import report, timed
+from chinese import freq
+
+
+def scan_frequency(hanzi, corpus='internet-zh'):
+    """The original implementation, kept here as the baseline."""
+
+    with open(join(freq.CORPUS_DIR, corpus), encoding='utf8') as f:
+        for line in f:
+            res = re.match('[0-9]+ ([0-9.]+) %s$' % re.escape(hanzi), line)
+            if res:
+                return freq.frequency_html(float(res.group(1)))
+    return '<div class="freq freq-unknown">unknown</div>'
+
+
+def indexed_frequency(words, corpus):
+    freq._indices.pop(corpus, None)
+    for w in words:
+        freq.get_frequency(w, corpus)
+
+
+def main(n_scan=200, n_index=20000):
+    for corpus in freq.CORPORA:
+        vocab = list(freq.load_corpus(corpus))
+        rng = Random(0)
+        words = [rng.choice(vocab) for _ in range(n_index)] + ['不存在的词']
+
+        for w in words[:n_scan]:
+            assert scan_frequency(w, corpus) == freq.get_frequency(w, corpus)
+
+        t = timed(lambda: [scan_frequency(w, corpus) for w in words[:n_scan]])
+        report('%s regex scan' % corpus, n_scan, t)
+        t = timed(indexed_frequency, words, corpus, repeat=3)
+        report('%s index (incl. build)' % corpus, len(words), t)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Latency of the first segmentation of a session.
+
+Each case runs in a fresh interpreter, since jieba only initializes once.
+"""
+
+from os.path import join
+from subprocess import run
+from sys import executable
+from tempfile import TemporaryDirectory
+
+from benchmarks import report
+
+SETUP = '''
+from time import perf_counter
+from unittest.mock import patch
+import tests
+from chinese.hanzi import split_hanzi
+import jieba
+jieba.dt.tmp_dir = {tmp_dir!r}
+patch('chinese.hanzi.USER_FILES', {user_files!r}).start()
+'''
+
+JIEBA_FIRST_CUT = SETUP + '''
+start = perf_counter()
+list(jieba.cut('我是学生'))
+print(perf_counter() - start)
+'''
+
+FIRST_EDIT = SETUP + '''
+start = perf_counter()
+split_hanzi('我是学生')
+print(perf_counter() - start)
+'''
+
+
+def first_cut(code, repeat=3, **kwargs):
+    best = None
+    for _ in range(repeat):
+        out = run(
+            [executable, '-c', code.format(**kwargs)],
+            capture_output=True,
+            check=True,
+            text=True,
+        )
+        elapsed = float(out.stdout.split()[-1])
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    with TemporaryDirectory() as tmp:
+        empty = join(tmp, 'empty')
+        dirs = {'tmp_dir': join(tmp, 'jieba'), 'user_files': empty}
+
+        t = first_cut(JIEBA_FIRST_CUT, repeat=1, **dirs)
+        report('jieba, building the prefix dict', 1, t)
+
+        t = first_cut(JIEBA_FIRST_CUT, **dirs)
+        report('jieba, from its temp dir cache', 1, t)
+
+        dirs['user_files'] = join(tmp, 'user_files')
+        t = first_cut(FIRST_EDIT, repeat=1, **dirs)
+        report('split_hanzi, building the prefix dict', 1, t)
+
+        t = first_cut(FIRST_EDIT, **dirs)
+        report('split_hanzi, from the user_files cache', 1, t)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Sentence segmentation: per-n-gram SQL probing vs. the in-memory index."""
+
+from random import Random
+
+from benchmarks import report, timed
+from chinese.database import Dictionary
+from chinese.util import add_with_space
+
+
+def sql_pinyin(d, word, type_, word_len=4):
+    """The original algorithm: up to word_len queries at every position."""
+
+    col = {'trad': 'traditional', 'simp': 'simplified'}[type_]
+
+    def lookup(w):
+        res = d.execute(
+            'SELECT pinyin, pinyin_tw FROM cidian '
+            'WHERE %s = ? AND NOT is_variant' % col,
+            (w,),
+        ).fetchone()
+        return d._format_pinyin(*res) if res else None
+
+    p = lookup(word)
+    if p:
+        return p
+    result = ''
+    while word:
+        for n in range(word_len, 1, -1):
+            p = lookup(word[:n])
+            if p:
+                result = add_with_space(result, p)
+                word = word[n:]
+                break
+        else:
+            result = add_with_space(result, d._get_char(word[0], 'pinyin') or word[0])
+            word = word[1:]
+    return result
+
+
+def sql_traditional(d, word, word_len=4):
+    """The original algorithm for get_traditional."""
+
+    def lookup(w):
+        res = d.execute(
+            'SELECT traditional FROM cidian '
+            'WHERE traditional = :word OR simplified = :word',
+            {'word': w},
+        ).fetchone()
+        return res[0] if res else None
+
+    p = lookup(word)
+    if p:
+        return p
+    result = ''
+    while word:
+        for n in range(word_len, 1, -1):
+            p = lookup(word[:n])
+            if p:
+                result += p
+                word = word[n:]
+                break
+        else:
+            result += d._get_char(word[0], 'trad') or word[0]
+            word = word[1:]
+    return result
+
+
+def sentences(d, n, seed=0):
+    rng = Random(seed)
+    rows = d.execute(
+        'SELECT simplified FROM cidian WHERE LENGTH(simplified) < 5'
+    )
+    vocab = [w for (w,) in rows]
+    return [
+        '，'.join(
+            ''.join(rng.choice(vocab) for _ in range(rng.randint(3, 6)))
+            for _ in range(rng.randint(1, 3))
+        )
+        for _ in range(n)
+    ]
+
+
+def main(n=500):
+    # Measure the lookups themselves rather than the LRU cache
+    d = Dictionary(cache_size=0)
+    texts = sentences(d, n)
+    chars = sum(map(len, texts))
+    print('%d sentences, %d characters' % (n, chars))
+
+    t = timed(lambda: [sql_pinyin(d, s, 'simp') for s in texts])
+    report('get_pinyin (SQL per n-gram)', n, t)
+
+    t = timed(lambda: [sql_traditional(d, s) for s in texts])
+    report('get_traditional (SQL per n-gram)', n, t)
+
+    t = timed(d._word_index)
+    report('index build (once per session)', 1, t)
+
+    t = timed(lambda: [d.get_pinyin(s, 'simp') for s in texts], repeat=3)
+    report('get_pinyin (index)', n, t)
+
+    t = timed(lambda: [d.get_traditional(s) for s in texts], repeat=3)
+    report('get_traditional (index)', n, t)
+
+
+if __name__ == '__main__':
+    main()
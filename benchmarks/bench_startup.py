@@ -0,0 +1,66 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Add-on import time, as measured by python -X importtime.
+
+Each case runs in a fresh interpreter with the Anki modules stubbed as in
+the unit tests; the stubs themselves are not counted.
+"""
+
+from subprocess import run
+from sys import executable
+
+CASES = [
+    ('startup (import chinese)', 'chinese'),
+    ('+ first edit (import chinese.behavior)', 'chinese.behavior'),
+    ('+ first bulk fill (import chinese.fill)', 'chinese.fill'),
+]
+
+
+def import_times(*modules):
+    """Return {module: (self, cumulative)} import times in microseconds."""
+
+    code = '; '.join('import %s' % m for m in modules)
+    out = run(
+        [executable, '-X', 'importtime', '-c', code],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own), int(cumulative))
+    return times
+
+
+def main():
+    baseline = import_times('tests')
+    for name, module in CASES:
+        times = import_times('tests', 'chinese', module)
+        added = {k: v for k, v in times.items() if k not in baseline}
+        total = sum(own for own, _ in added.values())
+        print('{:<40} {:>10.4f} s'.format(name, total / 1e6))
+        heaviest = sorted(added.items(), key=lambda kv: -kv[1][0])[:5]
+        for k, (own, _) in heaviest:
+            print('    {:<36} {:>10.4f} s'.format(k, own / 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Transcript sanitizing and coloring over about 10,000 syllables."""
+
+from random import Random
+from re import IGNORECASE, search, split
+
+from benchmarks import report, timed
+from chinese.color import colorize, colorize_fuse
+from chinese.consts import NOT_PINYIN_REGEX, PINYIN_REGEX
+from chinese.database import Dictionary
+from chinese.transcribe import (
+    accentuate,
+    replace_tone_marks,
+    sanitize_transcript,
+    split_transcript,
+    tone_number,
+)
+
+
+def regex_split_transcript(transcript):
+    """The original pinyin splitter, matching f-string patterns per call."""
+
+    def _split(s):
+        if search(f'^{PINYIN_REGEX}$', s, IGNORECASE):
+            return s
+        remainder = s.replace("'", '')
+        done = []
+        while remainder:
+            for i in range(len(remainder), 0, -1):
+                if search(f'^{PINYIN_REGEX}$', remainder[:i], IGNORECASE):
+                    done.append(remainder[:i])
+                    remainder = remainder[i:]
+                    break
+            else:
+                done.append(remainder)
+                break
+        return ' '.join(done)
+
+    separated = []
+    for text in split(NOT_PINYIN_REGEX, transcript):
+        separated.extend(_split(text).split())
+    return separated
+
+
+def corpus(n_syllables=10000, seed=0):
+    """Return words from the dictionary as users type them: spaced or run
+    together, with tone numbers or tone marks."""
+
+    rng = Random(seed)
+    d = Dictionary()
+    rows = d.execute(
+        'SELECT pinyin FROM cidian WHERE LENGTH(pinyin) > 0 '
+        "AND pinyin NOT LIKE '%,%' AND NOT is_variant"
+    )
+    words = [p.split() for (p,) in rows]
+    d.close()
+
+    texts = []
+    total = 0
+    while total < n_syllables:
+        syllables = rng.choice(words)
+        if rng.random() < 0.5:
+            syllables = accentuate(syllables, 'pinyin')
+        sep = rng.choice([' ', ''])
+        texts.append(sep.join(syllables))
+        total += len(syllables)
+    return texts, total
+
+
+def sentences(texts, n_syllables=50):
+    """Run the words together into sentence-length fields."""
+
+    fields = ['']
+    for text in texts:
+        if len(fields[-1]) > n_syllables * 3:
+            fields.append('')
+        fields[-1] += text.replace(' ', '')
+    return fields
+
+
+def main():
+    texts, n = corpus()
+    print('%d words, %d syllables' % (len(texts), n))
+
+    t = timed(lambda: [regex_split_transcript(s) for s in texts])
+    report('split_transcript (regex per call)', n, t)
+
+    t = timed(
+        lambda: [split_transcript(s, 'pinyin', False) for s in texts],
+        repeat=3,
+    )
+    report('split_transcript (syllable set)', n, t)
+
+    t = timed(
+        lambda: [sanitize_transcript(s, 'pinyin') for s in texts], repeat=3
+    )
+    report('sanitize_transcript', n, t)
+
+    syllables = sanitize_transcript(' '.join(texts), 'pinyin')
+    t = timed(lambda: [tone_number(s) for s in syllables], repeat=3)
+    report('tone_number', len(syllables), t)
+
+    t = timed(lambda: replace_tone_marks(syllables), repeat=3)
+    report('replace_tone_marks', len(syllables), t)
+
+    t = timed(lambda: [colorize([s]) for s in texts], repeat=3)
+    report('colorize', n, t)
+
+    hanzi = ['字'] * len(syllables)
+    t = timed(lambda: colorize_fuse(hanzi, syllables, ruby=True), repeat=3)
+    report('colorize_fuse', len(syllables), t)
+
+    fields = sentences(texts)
+    print('%d unspaced sentences' % len(fields))
+
+    t = timed(lambda: [regex_split_transcript(s) for s in fields])
+    report('split_transcript (regex per call)', n, t)
+
+    t = timed(
+        lambda: [split_transcript(s, 'pinyin', False) for s in fields],
+        repeat=3,
+    )
+    report('split_transcript (syllable set)', n, t)
+
+
+if __name__ == '__main__':
+    main()
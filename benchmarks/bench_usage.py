@@ -0,0 +1,117 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Matching usage sentences to dictionary entries in data/db/update.py.
+
+The Tatoeba corpus is not part of the repository, so a corpus of the same
+size is assembled from dictionary words.
+"""
+
+import sys
+from importlib import import_module
+from multiprocessing import Pool
+from os import cpu_count
+from os.path import abspath, dirname, join
+from random import Random
+
+from benchmarks import report, timed
+from chinese.database import Dictionary
+
+DB_DIR = join(dirname(abspath(__file__)), '..', 'chinese', 'data', 'db')
+
+
+def load_update():
+    # Importable by name, so that worker processes can unpickle its functions
+    sys.path.insert(0, DB_DIR)
+    return import_module('update')
+
+
+def scan_usage(entry, sentence_corpus):
+    """The original algorithm: a substring test against every sentence."""
+
+    usage = ''
+    for english_sentence, chinese_sentence in sentence_corpus.items():
+        if (
+            entry['simplified'] in chinese_sentence
+            or entry['traditional'] in chinese_sentence
+        ):
+            usage += '%s\n%s\n\n' % (chinese_sentence, english_sentence)
+    return usage.strip('\n')
+
+
+def corpus(entries, n_sentences=60000, seed=0):
+    rng = Random(seed)
+    vocab = [e['simplified'] for e in entries if len(e['simplified']) < 5]
+    return {
+        'sentence %d' % i: ''.join(
+            rng.choice(vocab) for _ in range(rng.randint(3, 8))
+        ) + '。'
+        for i in range(n_sentences)
+    }
+
+
+def main():
+    update = load_update()
+    d = Dictionary()
+    entries = [
+        {'traditional': t, 'simplified': s}
+        for t, s in d.execute('SELECT traditional, simplified FROM cidian')
+    ]
+    d.close()
+    sentence_corpus = corpus(entries)
+    print('%d entries, %d sentences' % (len(entries), len(sentence_corpus)))
+
+    sample = Random(1).sample(entries, 200)
+    t = timed(lambda: [scan_usage(e, sentence_corpus) for e in sample])
+    report('scan (200 entries)', len(sample), t)
+    report(
+        'scan (extrapolated to all entries)',
+        len(entries),
+        t * len(entries) / len(sample),
+    )
+
+    index = None
+
+    def build():
+        nonlocal index
+        index = update.SentenceIndex(sentence_corpus)
+
+    t = timed(build)
+    report('index build', len(sentence_corpus), t)
+
+    assert all(
+        index.usage(e['simplified'], e['traditional'])
+        == scan_usage(e, sentence_corpus)
+        for e in sample
+    )
+
+    t = timed(lambda: list(update.find_usage_sentences(entries, index)))
+    report('index lookups', len(entries), t)
+
+    jobs = cpu_count() or 1
+    if jobs > 1:
+        with Pool(
+            jobs, update.init_usage_worker, (sentence_corpus,)
+        ) as pool:
+            t = timed(
+                lambda: list(update.find_usage_sentences(entries, index, pool))
+            )
+        report('index lookups (%d processes)' % jobs, len(entries), t)
+
+
+if __name__ == '__main__':
+    main()
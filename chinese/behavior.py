@@ -43,6 +43,55 @@ from .util import (
 # FIXME: Do all these return values actually do anything?
 
 
+class FillContext:
+    """Work shared between the fill_* functions for one note's hanzi.
+
+    Segmentation, simplified and traditional forms, transcriptions and
+    sanitized transcripts are computed on first use, then reused by the
+    other fills run on the same note. The fills in FILLS all accept one as
+    their last argument.
+    """
+
+    def __init__(self, hanzi):
+        self.hanzi = hanzi
+        self.results = {}
+
+    def _get(self, key, compute):
+        if key not in self.results:
+            self.results[key] = compute()
+        return self.results[key]
+
+    def segments(self):
+        return self._get('segments', lambda: split_hanzi(self.hanzi))
+
+    def chars(self, text=None):
+        """Return the characters of text, or of the hanzi by default."""
+
+        if text is None:
+            text = self.hanzi
+        return self._get(
+            ('chars', text), lambda: split_hanzi(cleanup(text), grouped=False)
+        )
+
+    def simplified(self):
+        return self._get('simplified', lambda: get_simp(self.hanzi))
+
+    def traditional(self):
+        return self._get('traditional', lambda: get_trad(self.hanzi))
+
+    def transcription(self, target, type_):
+        return self._get(
+            ('transcription', target, type_),
+            lambda: transcribe(self.segments(), target, type_),
+        )
+
+    def sanitized(self, transcript, target):
+        return self._get(
+            ('sanitized', transcript, target),
+            lambda: sanitize_transcript(transcript, target, grouped=False),
+        )
+
+
 def split_classifiers(classifiers: list[str]) -> tuple[str, str]:
     # FIXME this needs tests written, 桌子 is a good one to test with
     if not classifiers:
@@ -70,36 +119,36 @@ def split_classifiers(classifiers: list[str]) -> tuple[str, str]:
     return (simplified_classifiers, traditional_classifiers)
 
 
-def fill_classifiers(hanzi, note):
+def fill_classifiers(hanzi, note, ctx=None):
     cs = dictionary.get_classifiers(hanzi)
     text = ', '.join(colorize_dict(c) for c in cs)
     simplified_classifier, traditional_classifier = split_classifiers(cs)
     filled = False
 
     # Both classifiers
-    if text and has_any_field(config['fields']['classifier'], note):
+    if text and has_any_field(note, config['fields']['classifier']):
         set_all(config['fields']['classifier'], note, to=text)
         filled = True
 
     # Simplified classifiers
-    if simplified_classifier and has_any_field(config['fields']['classifierSimplified'], note):
+    if simplified_classifier and has_any_field(note, config['fields']['classifierSimplified']):
         print(simplified_classifier)
         set_all(config['fields']['classifierSimplified'], note, to=simplified_classifier)
         filled = True
 
     # Traditional classifiers
-    if traditional_classifier and has_any_field(config['fields']['classifierTraditional'], note):
+    if traditional_classifier and has_any_field(note, config['fields']['classifierTraditional']):
         print(traditional_classifier)
         set_all(config['fields']['classifierTraditional'], note, to=traditional_classifier)
         filled = True
     return filled
 
 
-def fill_alt(hanzi, note):
+def fill_alt(hanzi, note, ctx=None):
     alts = dictionary.get_variants(hanzi)
     alt = ', '.join(colorize_dict(a) for a in alts)
     filled = False
-    if alt and has_any_field(config['fields']['alternative'], note):
+    if alt and has_any_field(note, config['fields']['alternative']):
         set_all(config['fields']['alternative'], note, to=alt)
         filled = True
     return filled
@@ -109,7 +158,7 @@ def fill_def(hanzi, note, lang):
     field = {'en': 'english', 'de': 'german', 'fr': 'french'}[lang]
     filled = False
 
-    if not has_any_field(config['fields'][field], note):
+    if not has_any_field(note, config['fields'][field]):
         return filled
 
     definition = ''
@@ -122,7 +171,7 @@ def fill_def(hanzi, note, lang):
     return filled
 
 
-def fill_all_defs(hanzi, note):
+def fill_all_defs(hanzi, note, ctx=None):
     n_filled = sum(
         [
             fill_def(hanzi, note, lang='en'),
@@ -133,18 +182,18 @@ def fill_all_defs(hanzi, note):
     return n_filled
 
 
-def fill_silhouette(hanzi, note):
+def fill_silhouette(hanzi, note, ctx=None):
     m = get_silhouette(hanzi)
     set_all(config['fields']['silhouette'], note, to=m)
 
 
-def fill_usage(hanzi, note):
+def fill_usage(hanzi, note, ctx=None):
     filled = False
 
     if not 'usage' in config['fields']:
         return filled
 
-    if not has_any_field(config['fields']['usage'], note):
+    if not has_any_field(note, config['fields']['usage']):
         return filled
 
     if get_first(config['fields']['usage'], note) == '':
@@ -166,9 +215,9 @@ def fill_usage(hanzi, note):
     return filled
 
 
-def fill_transcript(hanzi, note):
+def fill_transcript(hanzi, note, ctx=None):
+    ctx = ctx or FillContext(hanzi)
     n_filled = 0
-    separated = split_hanzi(hanzi)
 
     for key, target, type_ in [
         ('bopomofo', 'bopomofo', 'trad'),
@@ -177,7 +226,7 @@ def fill_transcript(hanzi, note):
         ('pinyinTaiwan', 'pinyin_tw', 'trad'),
     ]:
         if get_first(config['fields'][key], note) == '':
-            trans = colorize(transcribe(separated, target, type_), target)
+            trans = colorize(ctx.transcription(target, type_), target)
             trans = hide(trans, no_tone(trans))
             set_all(config['fields'][key], note, to=trans)
             n_filled += 1
@@ -204,7 +253,8 @@ def reformat_transcript(note, group, target):
     set_all(config['fields'][group], note, to=hidden)
 
 
-def fill_color(hanzi, note):
+def fill_color(hanzi, note, ctx=None):
+    ctx = ctx or FillContext(hanzi)
     if config['target'] in ['pinyin', 'pinyin_tw', 'bopomofo']:
         target = 'pinyin'
         field_group = 'pinyin'
@@ -216,16 +266,16 @@ def fill_color(hanzi, note):
 
     #hanziColor
     field = get_first(config['fields'][field_group], note)
-    trans = sanitize_transcript(field, target, grouped=False)
+    trans = ctx.sanitized(field, target)
     trans = split_transcript(' '.join(trans), target, grouped=False)
-    hanzi = split_hanzi(cleanup(hanzi), grouped=False)
+    hanzi = ctx.chars()
     colorized = colorize_fuse(hanzi, trans)
     set_all(config['fields']['colorHanzi'], note, to=colorized)
 
     #traditional color
     tradHanzi = get_first(config['fields']['traditional'], note)
     if tradHanzi:
-        tradHanzi = split_hanzi(cleanup(tradHanzi), grouped=False)
+        tradHanzi = ctx.chars(tradHanzi)
         colorized = colorize_fuse(tradHanzi, trans)
         set_all(config['fields']['colorTraditional'], note, to=colorized)
 
@@ -233,17 +283,17 @@ def fill_color(hanzi, note):
     cantoField = get_first(config['fields']['cantonese'], note)
     if cantoField:
         hanzi = tradHanzi if tradHanzi else hanzi
-        cantoTrans = sanitize_transcript(cantoField, "jyutping", grouped=False)
+        cantoTrans = ctx.sanitized(cantoField, 'jyutping')
         colorized = colorize_fuse(hanzi, cantoTrans)
         set_all(config['fields']['colorCantonese'], note, to=colorized)
 
 
-def fill_sound(hanzi, note):
+def fill_sound(hanzi, note, ctx=None, filenames=None):
     updated = 0
     errors = 0
     for f in config['fields']['sound'] + config['fields']['mandarinSound']:
         if f in note and note[f] == '':
-            s = sound(hanzi, config['speech'])
+            s = sound(hanzi, config['speech'], filenames)
             if s:
                 note[f] = s
                 updated += 1
@@ -252,66 +302,65 @@ def fill_sound(hanzi, note):
     return updated, errors
 
 
-def fill_simp(hanzi, note):
+def fill_simp(hanzi, note, ctx=None):
     if not get_first(config['fields']['simplified'], note) == '':
         return
 
-    s = get_simp(hanzi)
+    s = (ctx or FillContext(hanzi)).simplified()
     if s is not None and s != hanzi:
         set_all(config['fields']['simplified'], note, to=s)
     else:
         set_all(config['fields']['simplified'], note, to=hanzi)
 
 
-def fill_trad(hanzi, note):
+def fill_trad(hanzi, note, ctx=None):
     if not get_first(config['fields']['traditional'], note) == '':
         return
 
-    t = get_trad(hanzi)
+    t = (ctx or FillContext(hanzi)).traditional()
     if t is not None and t != hanzi:
         set_all(config['fields']['traditional'], note, to=t)
     else:
         set_all(config['fields']['traditional'], note, to=hanzi)
 
 
-def fill_frequency(hanzi, note) -> bool:
+def fill_frequency(hanzi, note, ctx=None) -> bool:
     if get_first(config['fields']['frequency'], note) == '':
         set_all(
             config['fields']['frequency'],
             note,
-            to=get_frequency(get_simp(hanzi)),
+            to=get_frequency((ctx or FillContext(hanzi)).simplified()),
         )
         return True
 
     return False
 
 
-def fill_ruby(hanzi, note, trans_group, ruby_group):
+def fill_ruby(hanzi, note, trans_group, ruby_group, ctx=None):
+    ctx = ctx or FillContext(hanzi)
     if trans_group == 'bopomofo':
         trans = flatten(
-            s.split()
-            for s in transcribe(
-                split_hanzi(hanzi, grouped=True), 'bopomofo', 'trad'
-            )
+            s.split() for s in ctx.transcription('bopomofo', 'trad')
         )
     elif trans_group in ['pinyin', 'pinyinTaiwan']:
         field = get_first(config['fields'][trans_group], note)
-        trans = sanitize_transcript(field, 'pinyin', grouped=False)
+        trans = ctx.sanitized(field, 'pinyin')
     elif trans_group == 'cantonese':
         field = get_first(config['fields'][trans_group], note)
-        trans = sanitize_transcript(field, 'jyutping', grouped=False)
+        trans = ctx.sanitized(field, 'jyutping')
     else:
         raise NotImplementedError(trans_group)
 
-    hanzi = split_hanzi(cleanup(hanzi), grouped=False)
-    rubified = colorize_fuse(hanzi, trans, ruby=True)
+    rubified = colorize_fuse(ctx.chars(), trans, ruby=True)
     set_all(config['fields'][ruby_group], note, to=rubified)
 
 
-def fill_all_rubies(hanzi, note):
+def fill_all_rubies(hanzi, note, ctx=None):
+    ctx = ctx or FillContext(hanzi)
+
     for trans_group in ['pinyin', 'pinyinTaiwan', 'cantonese', 'bopomofo']:
-        if has_any_field(config['fields'][trans_group], note):
-            fill_ruby(hanzi, note, trans_group, 'ruby')
+        if has_any_field(note, config['fields'][trans_group]):
+            fill_ruby(hanzi, note, trans_group, 'ruby', ctx)
             break
 
     for trans_group, ruby_group in [
@@ -320,7 +369,88 @@ def fill_all_rubies(hanzi, note):
         ('cantonese', 'rubyCantonese'),
         ('bopomofo', 'rubyBopomofo'),
     ]:
-        fill_ruby(hanzi, note, trans_group, ruby_group)
+        fill_ruby(hanzi, note, trans_group, ruby_group, ctx)
+
+
+# The fills run by update_fields, in order, with the field groups each one
+# reads (besides the hanzi) and the groups it writes to
+FILLS = {
+    'hanzi': [
+        (fill_alt, [], ['alternative']),
+        (fill_all_defs, [], ['english', 'german', 'french']),
+        (
+            fill_classifiers,
+            [],
+            ['classifier', 'classifierSimplified', 'classifierTraditional'],
+        ),
+        (
+            fill_transcript,
+            ['bopomofo', 'cantonese', 'pinyin', 'pinyinTaiwan'],
+            ['bopomofo', 'cantonese', 'pinyin', 'pinyinTaiwan'],
+        ),
+        (fill_trad, ['traditional'], ['traditional']),
+        (
+            fill_color,
+            ['pinyin', 'jyutping', 'traditional', 'cantonese'],
+            ['colorHanzi', 'colorTraditional', 'colorCantonese'],
+        ),
+        (fill_sound, [], ['sound', 'mandarinSound']),
+        (fill_simp, ['simplified'], ['simplified']),
+        (fill_frequency, ['frequency'], ['frequency']),
+        (
+            fill_all_rubies,
+            ['pinyin', 'pinyinTaiwan', 'cantonese', 'bopomofo'],
+            [
+                'ruby',
+                'rubyPinyin',
+                'rubyPinyinTaiwan',
+                'rubyCantonese',
+                'rubyBopomofo',
+            ],
+        ),
+        (fill_silhouette, [], ['silhouette']),
+        (fill_usage, ['usage'], ['usage']),
+    ],
+}
+FILLS['transcript'] = [
+    (fill, reads, writes)
+    for fill, reads, writes in FILLS['hanzi']
+    if fill in [fill_color, fill_all_rubies]
+]
+
+_fill_plans = {}
+
+
+def field_groups(field_names):
+    """Return the config field groups matching any of field_names."""
+
+    names = {f.lower() for f in field_names}
+    return {
+        group
+        for group, fields in config['fields'].items()
+        if names.intersection(f.lower() for f in fields)
+    }
+
+
+def plan_fills(kind, note_fields, fields):
+    """Return the fills of FILLS[kind] that can change any of fields.
+
+    A fill is kept if it writes to one of fields, or to a field of the note
+    that a later kept fill reads. Plans are cached per note type, which is
+    identified by its field names so that renaming a field gets a new plan.
+    """
+
+    key = (kind, tuple(note_fields), tuple(fields))
+    if key not in _fill_plans:
+        present = field_groups(note_fields)
+        wanted = field_groups(fields)
+        plan = []
+        for fill, reads, writes in reversed(FILLS[kind]):
+            if wanted.intersection(writes):
+                plan.insert(0, fill)
+                wanted.update(present.intersection(reads))
+        _fill_plans[key] = plan
+    return _fill_plans[key]
 
 
 def update_fields(note, focus_field, fields):
@@ -329,6 +459,7 @@ def update_fields(note, focus_field, fields):
     if not hanzi:
         return False
     hanzi = cleanup(hanzi)
+    ctx = FillContext(hanzi)
 
     transcript_fields = (
         config['fields']['pinyin']
@@ -338,23 +469,13 @@ def update_fields(note, focus_field, fields):
     )
 
     if focus_field in transcript_fields:
-        fill_color(hanzi, copy)
-        fill_all_rubies(hanzi, copy)
+        for fill in plan_fills('transcript', copy, fields):
+            fill(hanzi, copy, ctx)
 
     if focus_field in config['fields']['hanzi']:
         if copy[focus_field]:
-            fill_alt(hanzi, copy)
-            fill_all_defs(hanzi, copy)
-            fill_classifiers(hanzi, copy)
-            fill_transcript(hanzi, copy)
-            fill_trad(hanzi, copy)
-            fill_color(hanzi, copy)
-            fill_sound(hanzi, copy)
-            fill_simp(hanzi, copy)
-            fill_frequency(hanzi, copy)
-            fill_all_rubies(hanzi, copy)
-            fill_silhouette(hanzi, copy)
-            fill_usage(hanzi, copy)
+            for fill in plan_fills('hanzi', copy, fields):
+                fill(hanzi, copy, ctx)
         else:
             erase_fields(copy, config.get_fields())
     elif focus_field in config['fields']['pinyin']:
@@ -16,64 +16,65 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
-from re import IGNORECASE, search, sub
-
-from .consts import (
-    BOPOMOFO_REGEX,
-    COLOR_RUBY_TEMPLATE,
-    COLOR_TEMPLATE,
-    HALF_RUBY_REGEX,
-    HANZI_RANGE,
-    JYUTPING_REGEX,
-    PINYIN_REGEX,
-    RUBY_REGEX,
-)
+from functools import lru_cache
+from re import sub
+
+from .consts import COLOR_RUBY_TEMPLATE, COLOR_TEMPLATE, HANZI_RANGE
 from .hanzi import split_hanzi
+from .patterns import (
+    BOPOMOFO_SYLLABLE,
+    HALF_RUBY,
+    JYUTPING_SYLLABLE,
+    PINYIN_SYLLABLE,
+    RUBY,
+    RUBY_SYLLABLE,
+)
 from .sound import extract_tags
 from .transcribe import tone_number, sanitize_transcript
 from .util import align, is_punc, no_color
 
+SYLLABLE_PATTERNS = {
+    'pinyin': PINYIN_SYLLABLE,
+    'pinyin_tw': PINYIN_SYLLABLE,
+    'jyutping': JYUTPING_SYLLABLE,
+    'bopomofo': BOPOMOFO_SYLLABLE,
+}
 
-def colorize(words, target='pinyin', ruby_whole=False):
-    from .ruby import has_ruby
+# The same few hundred syllables make up most transcripts
+syllable_tone = lru_cache(maxsize=4096)(tone_number)
+
+
+def _color(p):
+    return COLOR_TEMPLATE.format(
+        tone=syllable_tone(p.group(1)), chars=p.group()
+    )
 
+
+def colorize(words, target='pinyin', ruby_whole=False):
     assert isinstance(words, list)
 
-    def _repl(p):
-        return COLOR_TEMPLATE.format(
-            tone=tone_number(p.group(1)), chars=p.group()
-        )
+    if target not in SYLLABLE_PATTERNS:
+        raise NotImplementedError(target)
 
+    pattern = SYLLABLE_PATTERNS[target]
+    ruby_pattern = RUBY_SYLLABLE if ruby_whole else HALF_RUBY
     done = []
 
-    d = {
-        'pinyin': PINYIN_REGEX,
-        'pinyin_tw': PINYIN_REGEX,
-        'jyutping': JYUTPING_REGEX,
-        'bopomofo': BOPOMOFO_REGEX,
-    }
-
     for word in words:
         (word, sound_tags) = extract_tags(no_color(word))
 
-        if target in d:
-            pattern = d[target]
-            text = ''
-            for syllable in word.split():
-                if search(f'^{pattern}$', syllable):
-                    text += sub(f'^{pattern}$', _repl, syllable, IGNORECASE)
-                elif has_ruby(syllable):
-                    if ruby_whole:
-                        pattern = RUBY_REGEX
-                    else:
-                        pattern = HALF_RUBY_REGEX
-                    text += sub(pattern, _repl, syllable, IGNORECASE)
-                else:
-                    text += f'<span class="tone5">{syllable}</span>'
-        else:
-            raise NotImplementedError(target)
+        parts = []
+        for syllable in word.split():
+            m = pattern.search(syllable)
+            if m:
+                parts.append(_color(m))
+            elif RUBY.search(syllable):
+                parts.append(ruby_pattern.sub(_color, syllable))
+            else:
+                parts.append(f'<span class="tone5">{syllable}</span>')
+        parts.append(sound_tags)
 
-        done.append(text + sound_tags)
+        done.append(''.join(parts))
 
     return ' '.join(done)
 
@@ -108,19 +109,23 @@ def colorize_fuse(chars: list, trans: list, ruby=False):
     assert isinstance(chars, list)
     assert isinstance(trans, list)
 
-    colorized = ''
+    colorized = []
 
     for c, t in align(chars, trans):
         if c is None or t is None:
             continue
         if is_punc(c) and is_punc(t):
-            colorized += c
+            colorized.append(c)
             continue
         if ruby:
-            colorized += COLOR_RUBY_TEMPLATE.format(
-                tone=tone_number(t), chars=c, trans=t
+            colorized.append(
+                COLOR_RUBY_TEMPLATE.format(
+                    tone=syllable_tone(t), chars=c, trans=t
+                )
             )
         else:
-            colorized += COLOR_TEMPLATE.format(tone=tone_number(t), chars=c)
+            colorized.append(
+                COLOR_TEMPLATE.format(tone=syllable_tone(t), chars=c)
+            )
 
-    return colorized
+    return ''.join(colorized)
@@ -29,14 +29,28 @@ class ConfigManager:
     default_path = join(dirname(realpath(__file__)), 'config.json')
     saved_path = join(dirname(realpath(__file__)), 'config_saved.json')
 
-    with open(default_path, encoding='utf-8') as f:
-        config = defaultdict(str, load(f))
-
-    if exists(saved_path):
-        with open(saved_path, encoding='utf-8') as f:
-            config_saved = defaultdict(str, load(f))
-        if config_saved['version'] == config['version']:
-            config = config_saved
+    def __init__(self):
+        self._config = None
+
+    @property
+    def config(self):
+        """Settings, read from disk the first time they are needed."""
+
+        if self._config is None:
+            self._config = self.load()
+        return self._config
+
+    def load(self):
+        with open(self.default_path, encoding='utf-8') as f:
+            config = defaultdict(str, load(f))
+
+        if exists(self.saved_path):
+            with open(self.saved_path, encoding='utf-8') as f:
+                config_saved = defaultdict(str, load(f))
+            if config_saved['version'] == config['version']:
+                config = config_saved
+
+        return config
 
     def __setitem__(self, key, value):
         self.config[key] = value
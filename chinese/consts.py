@@ -16,6 +16,8 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
+from unicodedata import lookup
+
 PINYIN_VOWELS = 'ɑ̄āĀáɑ́ǎɑ̌ÁǍàɑ̀ÀēĒéÉěĚèÈīĪíÍǐǏìÌōŌóÓǒǑòÒūŪúÚǔǓùÙǖǕǘǗǚǙǜǛ'
 
 PINYIN_INITIALS = 'zh|sh|ch|chu|[bpmfdtnlgkhjqxrzscwy]'
@@ -254,5 +256,8 @@ DIACRITIC_NAME_TO_NUM = {
     'COMBINING GRAVE ACCENT': '4',
 }
 
+DIACRITIC_TO_NUM = {lookup(k): v for k, v in DIACRITIC_NAME_TO_NUM.items()}
+NUM_TO_DIACRITIC = {v: k for k, v in DIACRITIC_TO_NUM.items()}
+
 CLOZE_REGEX = r'\{\{c[0-9]+::(.*?)(::.*?)?\}\}'
 SOUND_TAG_REGEX = r'\[sound:.*?\]'
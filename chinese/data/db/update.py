@@ -19,15 +19,23 @@
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
 from argparse import ArgumentParser
-from os import remove, walk
-from os.path import join, isfile, abspath, dirname, basename, relpath
+from collections import defaultdict
+from contextlib import contextmanager
+from hashlib import sha256
+from multiprocessing import Pool
+from os import cpu_count, remove, replace, walk
+from os.path import join, isfile, abspath, dirname, basename, getsize, relpath
 from re import finditer, match
-from sqlite3 import IntegrityError, connect
-from requests import get
-from io import BytesIO
-from bz2 import BZ2File
+from sqlite3 import connect
+from io import TextIOWrapper
+from bz2 import open as bz2open
 from csv import reader
+from json import dump, load
+from shutil import copyfile, copyfileobj
 from tarfile import open as taropen
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+from xml.etree.ElementTree import iterparse
 from zipfile import ZipFile, ZIP_DEFLATED
 from yaspin import yaspin
 
@@ -56,10 +64,30 @@ WORD_COLS = [
     'german',
     'french',
     'english_usage',
+    'is_variant',
 ]
 
 TO_LOWER = ['pinyin', 'pinyin_tw', 'jyutping']
 
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+DOWNLOAD_TIMEOUT = 60
+
+# Entries per batch sent to a worker process when matching usage sentences
+USAGE_CHUNK_SIZE = 1000
+
+# Gap between the rowids of consecutive rows of a full build, left for the
+# rows an update adds in between
+ROWID_STEP = 64
+
+# The database is rebuilt from scratch, so a crash midway only costs a rerun:
+# skip the rollback journal and fsyncs while loading
+BUILD_PRAGMAS = {
+    'journal_mode': 'OFF',
+    'synchronous': 'OFF',
+    'temp_store': 'MEMORY',
+    'cache_size': -256 * 1024,
+}
+
 #TODO
 # JyutDict (zhongwenlearner.com)
 # CC-ChEDICC (cc-chedicc.wikispaces.com)
@@ -68,6 +96,8 @@ UNIHAN_INFO = {
     'name': 'Unihan',
     'url': 'https://unicode.org/Public/UCD/latest/ucdxml/ucd.unihan.flat.zip',
     'out_filename': 'ucd.unihan.flat.xml',
+    # Kept compressed and read in place rather than extracted
+    'zip_filename': 'ucd.unihan.flat.zip',
 }
 
 DICT_DEFINITION_INVENTORY = [
@@ -98,19 +128,89 @@ DICT_DEFINITION_INVENTORY = [
     },
 ]
 
+TATOEBA_NAME = 'Tatoeba'
+
+def fetch(url, path, headers=None):
+    """Download url to path in chunks, and return whether path changed.
+
+    The ETag and Last-Modified of the download are kept in path.meta and
+    sent back next time, so that an unchanged source is answered with 304
+    Not Modified and skipped. An interrupted download is left in path.part
+    and resumed with a Range request, provided the source hasn't changed in
+    the meantime (If-Range).
+
+    Content is requested without Content-Encoding, so that byte ranges
+    refer to the file itself; the sources are compressed archives anyway.
+    """
+
+    meta_path = path + '.meta'
+    part_path = path + '.part'
+    meta = {}
+    if isfile(meta_path):
+        with open(meta_path, encoding='utf-8') as meta_fd:
+            meta = load(meta_fd)
+        if meta.get('url') != url:
+            meta = {}
+    validator = meta.get('etag') or meta.get('last_modified')
+
+    request = Request(url, headers=headers or {})
+    if isfile(part_path) and validator:
+        request.add_header('Range', 'bytes=%d-' % getsize(part_path))
+        request.add_header('If-Range', validator)
+    elif isfile(path) and validator:
+        if meta.get('etag'):
+            request.add_header('If-None-Match', meta['etag'])
+        if meta.get('last_modified'):
+            request.add_header('If-Modified-Since', meta['last_modified'])
+
+    try:
+        response = urlopen(request, timeout=DOWNLOAD_TIMEOUT)
+    except HTTPError as e:
+        if e.code == 304:
+            return False
+        if e.code == 416 and isfile(part_path):
+            # Nothing left to download: the part is the whole file
+            replace(part_path, path)
+            return True
+        raise
+
+    with response:
+        if response.status == 206:
+            mode = 'ab'
+        else:
+            mode = 'wb'
+            meta = {
+                'url': url,
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+            with open(meta_path, 'w', encoding='utf-8') as meta_fd:
+                dump(meta, meta_fd)
+        with open(part_path, mode) as part_fd:
+            copyfileobj(response, part_fd, DOWNLOAD_CHUNK_SIZE)
+
+    replace(part_path, path)
+    return True
+
+
 def download_dictionary(dictionary_definition):
     with yaspin(
         text='Downloading %s Dictionary' % dictionary_definition['name']
     ).cyan.bold.dots12 as spinner:
         #some of the sources now require a user agent
-        headers = {"Accept-Encoding": "gzip, deflate, br", "User-Agent": "Mozilla/5.0 Gecko/20100101 Firefox/84.0"}
-        dictionary_response_stream = get(dictionary_definition['url'], headers=headers, stream=True)
-
-        if dictionary_definition['url'].endswith('.u8'):
-            with open("%s/%s" % (DATA_DIR, dictionary_definition['out_filename']), "w", encoding='utf-8') as download_fd:
-                download_fd.write(dictionary_response_stream.text)
+        headers = {"User-Agent": "Mozilla/5.0 Gecko/20100101 Firefox/84.0"}
+        url = dictionary_definition['url']
+        out_path = join(DATA_DIR, dictionary_definition['out_filename'])
+
+        if url.endswith('.u8'):
+            fetch(url, out_path, headers)
+        elif 'zip_filename' in dictionary_definition:
+            fetch(url, join(DATA_DIR, dictionary_definition['zip_filename']), headers)
         else:
-            ZipFile(BytesIO(dictionary_response_stream.content)).extract(dictionary_definition['out_filename'], DATA_DIR)
+            zip_path = join(DATA_DIR, basename(url))
+            if fetch(url, zip_path, headers) or not isfile(out_path):
+                with ZipFile(zip_path) as zip_fd:
+                    zip_fd.extract(dictionary_definition['out_filename'], DATA_DIR)
 
         spinner.ok()
         return
@@ -122,6 +222,11 @@ def create_words_table (db_cursor):
         'CREATE TABLE cidian (%s, PRIMARY KEY(traditional, pinyin))'
         % ', '.join(WORD_COLS)
     )
+    return
+
+
+def create_words_indices(db_cursor):
+    # Built once the rows are in, rather than updated on every insert
     db_cursor.execute('CREATE INDEX isimplified ON cidian (simplified)')
     db_cursor.execute(
         'CREATE UNIQUE INDEX itraditional ON cidian (traditional, pinyin)'
@@ -129,20 +234,78 @@ def create_words_table (db_cursor):
     return
 
 
-def populate_words(db_cursor):
-
+def merge_dictionaries():
+    # Entries of all the dictionaries, merged on (traditional, pinyin) and
+    # kept in the order they were first seen, which becomes the rowid order
+    merged_entries = {}
     for dictionary_definition in DICT_DEFINITION_INVENTORY:
         with yaspin(
             text='Importing %s, this may take awhile..' % dictionary_definition['name']
         ).cyan.bold.dots12 as spinner:
-
-            sentence_corpus = get_tatoeba_corpus_dict()
             for dictionary_entry in get_cedict_entries(dictionary_definition):
-                dictionary_entry['english_usage'] = ""
-                populate_usage_sentences(dictionary_entry, sentence_corpus)
-                process_dictionary_entry(dictionary_entry, db_cursor)
+                process_dictionary_entry(dictionary_entry, merged_entries)
             spinner.ok()
 
+    return merged_entries
+
+
+def add_usage_sentences(dictionary_entries, sentence_corpus, jobs=1):
+    if not dictionary_entries:
+        return
+
+    with yaspin(
+        text='Matching usage sentences for {:,} words'.format(len(dictionary_entries))
+    ).cyan.bold.dots12 as spinner:
+        # Only sentences sharing a character with the words can contain them,
+        # which spares indexing the whole corpus for a few changed entries
+        hanzi = set()
+        for dictionary_entry in dictionary_entries:
+            hanzi.update(dictionary_entry['simplified'], dictionary_entry['traditional'])
+        sentence_corpus = {
+            english_sentence: chinese_sentence
+            for english_sentence, chinese_sentence in sentence_corpus.items()
+            if not hanzi.isdisjoint(chinese_sentence)
+        }
+
+        # Loaded and indexed once, in each worker process if there are several
+        sentence_index = pool = None
+        if jobs > 1 and len(dictionary_entries) > USAGE_CHUNK_SIZE:
+            pool = Pool(jobs, init_usage_worker, (sentence_corpus,))
+        else:
+            sentence_index = SentenceIndex(sentence_corpus)
+
+        for dictionary_entry, english_usage in zip(
+            dictionary_entries,
+            find_usage_sentences(dictionary_entries, sentence_index, pool),
+        ):
+            dictionary_entry['english_usage'] = english_usage
+
+        if pool:
+            pool.close()
+            pool.join()
+        spinner.ok()
+
+
+def populate_words(db_cursor, jobs=1):
+    merged_entries = merge_dictionaries()
+    flag_variants(merged_entries.values())
+    add_usage_sentences(
+        list(merged_entries.values()), get_tatoeba_corpus_dict(), jobs
+    )
+
+    with yaspin(text='Writing words').cyan.bold.dots12 as spinner:
+        insert_rows(
+            db_cursor,
+            'cidian',
+            WORD_COLS,
+            number_rows(
+                [dictionary_entry.get(col) for col in WORD_COLS]
+                for dictionary_entry in merged_entries.values()
+            ),
+        )
+        create_words_indices(db_cursor)
+        spinner.ok()
+
     print(
         'Imported {:,} words'.format(
             db_cursor.execute('SELECT count(simplified) FROM cidian').fetchone()[0]
@@ -150,8 +313,178 @@ def populate_words(db_cursor):
     )
 
 
-def open_db_connection():
+def update_words(db_cursor, sentence_corpus, changed_sentences, jobs=1):
+    """Apply the changes in the dictionaries and the sentence corpus to the
+    cidian table.
+
+    Usage sentences are matched again only for new entries, entries whose
+    simplified form changed, and entries found in changed_sentences, an
+    index of the sentences added to or removed from the corpus, empty if it
+    is unchanged. If that is None, the previous corpus is unknown and every
+    entry is matched again.
+    """
+
+    merged_entries = merge_dictionaries()
+    flag_variants(merged_entries.values())
+    old_rows = read_rows(db_cursor, 'cidian', WORD_COLS, ['traditional', 'pinyin'])
+
+    simplified_col = WORD_COLS.index('simplified')
+    usage_col = WORD_COLS.index('english_usage')
+    unmatched_entries = []
+    for key, dictionary_entry in merged_entries.items():
+        if key in old_rows:
+            old_values = old_rows[key][1]
+            if not (
+                changed_sentences is None
+                or old_values[simplified_col] != dictionary_entry['simplified']
+                or changed_sentences.sentences and (
+                    changed_sentences.find(dictionary_entry['simplified'])
+                    or changed_sentences.find(dictionary_entry['traditional'])
+                )
+            ):
+                dictionary_entry['english_usage'] = old_values[usage_col]
+                continue
+        unmatched_entries.append(dictionary_entry)
+    add_usage_sentences(unmatched_entries, sentence_corpus, jobs)
+
+    write_changes(
+        db_cursor,
+        'cidian',
+        WORD_COLS,
+        old_rows,
+        {
+            key: [dictionary_entry.get(col) for col in WORD_COLS]
+            for key, dictionary_entry in merged_entries.items()
+        },
+    )
+
+
+def read_rows(db_cursor, table, cols, key_cols):
+    """Return {key: (rowid, values)} for each row of table, where values
+    are those of cols and key those of key_cols."""
+
+    key_indices = [cols.index(col) for col in key_cols]
+    rows = {}
+    for rowid, *values in db_cursor.execute(
+        'SELECT rowid, {} FROM {}'.format(', '.join(cols), table)
+    ):
+        rows[tuple(values[i] for i in key_indices)] = (rowid, values)
+    return rows
+
+
+def insert_rows(db_cursor, table, cols, rows):
+    """Insert rows, each a rowid followed by the values of cols."""
+
+    db_cursor.executemany(
+        'INSERT INTO {} (rowid, {}) VALUES ({})'.format(
+            table, ', '.join(cols), ', '.join(['?'] * (len(cols) + 1))
+        ),
+        rows,
+    )
+
+
+def number_rows(rows):
+    # Spread out, so that rows added by an update fit in between
+    return ([(i + 1) * ROWID_STEP] + values for i, values in enumerate(rows))
+
+
+def place_rows(keys, old_rows):
+    """Return a rowid for each of keys, in source order.
+
+    Keys of old_rows keep their rowid and new keys are given one between
+    those of their neighbours. Returns None if the old rows are no longer in
+    source order, or there is no room left between two of them.
+    """
+
+    rowids = [old_rows[key][0] if key in old_rows else None for key in keys]
+    kept = [rowid for rowid in rowids if rowid is not None]
+    if any(rowid >= next_rowid for rowid, next_rowid in zip(kept, kept[1:])):
+        return None
+
+    start = 0
+    while start < len(rowids):
+        if rowids[start] is not None:
+            start += 1
+            continue
+        end = start
+        while end < len(rowids) and rowids[end] is None:
+            end += 1
+        low = rowids[start - 1] if start else 0
+        if end < len(rowids):
+            step = (rowids[end] - low) // (end - start + 1)
+        else:
+            step = ROWID_STEP
+        if not step:
+            return None
+        rowids[start:end] = [low + (i + 1) * step for i in range(end - start)]
+        start = end
+    return rowids
+
+
+def write_changes(db_cursor, table, cols, old_rows, new_rows):
+    """Bring table from old_rows, as returned by read_rows, to new_rows,
+    keyed in the same way and in source order, writing only the rows that
+    differ.
+
+    The rowid order is the source order, as after a full build: lookups
+    keep the first of several matching entries. New rows are placed between
+    their neighbours, and all rows are renumbered if that is not possible.
+    """
+
+    rowids = place_rows(list(new_rows), old_rows)
+    if rowids is None:
+        rowids = [(i + 1) * ROWID_STEP for i in range(len(new_rows))]
+
+    inserts, updates, moves = [], [], []
+    for rowid, (key, values) in zip(rowids, new_rows.items()):
+        if key not in old_rows:
+            inserts.append([rowid] + values)
+        elif old_rows[key][0] != rowid:
+            moves.append(old_rows[key][0])
+            inserts.append([rowid] + values)
+        elif old_rows[key][1] != values:
+            updates.append(values + [rowid])
+    removed = [rowid for key, (rowid, _) in old_rows.items() if key not in new_rows]
+
+    db_cursor.executemany(
+        'DELETE FROM {} WHERE rowid = ?'.format(table),
+        ((rowid,) for rowid in removed + moves),
+    )
+    db_cursor.executemany(
+        'UPDATE {} SET {} WHERE rowid = ?'.format(
+            table, ', '.join('%s = ?' % col for col in cols)
+        ),
+        updates,
+    )
+    insert_rows(db_cursor, table, cols, inserts)
+    print(
+        'Updated {}: {:,} added, {:,} changed, {:,} moved, {:,} removed'.format(
+            table, len(inserts) - len(moves), len(updates), len(moves), len(removed)
+        )
+    )
+
+
+def flag_variants(dictionary_entries):
+    # Entries defined as a variant of another word are skipped when looking up
+    # readings. Matching on the merged definitions once here spares the add-on
+    # from running LIKE '%variant%' filters itself. Flagging the entries
+    # rather than the table lets an update write only the rows that changed.
+    n_variants = 0
+    for dictionary_entry in dictionary_entries:
+        dictionary_entry['is_variant'] = int(
+            any(
+                'variant' in (dictionary_entry.get(col) or '').lower()
+                for col in ['english', 'german', 'french']
+            )
+        )
+        n_variants += dictionary_entry['is_variant']
+    print('Flagged {:,} variants'.format(n_variants))
+
+
+def open_db_connection(pragmas=BUILD_PRAGMAS):
     db_connection = connect(DB_PATH)
+    for name, value in pragmas.items():
+        db_connection.execute('PRAGMA %s = %s' % (name, value))
     db_cursor = db_connection.cursor()
     return db_connection, db_cursor
 
@@ -179,14 +512,73 @@ def get_cedict_entries(dictionary_definition):
                 yield dict_entry
 
 
-def populate_usage_sentences(dictionary_entry, sentence_corpus):
-    dictionary_entry["english_usage"] = ""
-    for english_sentence, chinese_sentence in sentence_corpus.items():
-        if dictionary_entry['simplified'] in chinese_sentence or dictionary_entry['traditional'] in chinese_sentence:
-            dictionary_entry['english_usage'] += "%s\n%s\n\n" % (chinese_sentence, english_sentence)
-    if dictionary_entry['english_usage'] != "":
-        dictionary_entry['english_usage'] = dictionary_entry['english_usage'].strip('\n')
-    return
+class SentenceIndex:
+    """Inverted index of the usage sentence corpus.
+
+    Every character and pair of adjacent characters maps to the ids of the
+    sentences containing it, in corpus order. The sentences containing a
+    word are found by checking only those listed under its rarest pair,
+    instead of scanning the whole corpus for every dictionary entry.
+    """
+
+    def __init__(self, sentence_corpus):
+        self.sentences = [
+            (chinese_sentence, english_sentence)
+            for english_sentence, chinese_sentence in sentence_corpus.items()
+        ]
+        self.postings = defaultdict(list)
+        for sentence_id, (chinese_sentence, _) in enumerate(self.sentences):
+            for key in set(chinese_sentence) | set(bigrams(chinese_sentence)):
+                self.postings[key].append(sentence_id)
+
+    def find(self, word):
+        """Return the ids of the sentences containing word, in order."""
+
+        if not word:
+            return range(len(self.sentences))
+        keys = bigrams(word) if len(word) > 1 else [word]
+        candidates = min((self.postings.get(key, []) for key in keys), key=len)
+        return [i for i in candidates if word in self.sentences[i][0]]
+
+    def usage(self, simplified, traditional):
+        sentence_ids = sorted(
+            set(self.find(simplified)).union(self.find(traditional))
+        )
+        return ''.join(
+            "%s\n%s\n\n" % self.sentences[i] for i in sentence_ids
+        ).strip('\n')
+
+
+def bigrams(text):
+    return [text[i:i + 2] for i in range(len(text) - 1)]
+
+
+_sentence_index = None
+
+
+def init_usage_worker(sentence_corpus):
+    global _sentence_index
+    _sentence_index = SentenceIndex(sentence_corpus)
+
+
+def usage_worker(words):
+    return _sentence_index.usage(*words)
+
+
+def find_usage_sentences(dictionary_entries, sentence_index, pool=None):
+    """Yield the usage sentences of each entry, in the same order.
+
+    With a pool, entries are matched in worker processes, each holding its
+    own copy of the index.
+    """
+
+    words = [
+        (dictionary_entry['simplified'], dictionary_entry['traditional'])
+        for dictionary_entry in dictionary_entries
+    ]
+    if pool:
+        return pool.imap(usage_worker, words, chunksize=USAGE_CHUNK_SIZE)
+    return (sentence_index.usage(*w) for w in words)
 
 
 def download_tatoeba_sentence_corpus(langCode1='eng', langCode2='cmn'):
@@ -199,20 +591,46 @@ def download_tatoeba_sentence_corpus(langCode1='eng', langCode2='cmn'):
     return merged_corpus_dict
 
 
+def get_tatoeba_corpus_path(langCode1='eng', langCode2='cmn'):
+    return join(DATA_DIR, langCode1 + '_' + langCode2 + '.csv')
+
+
+def get_previous_corpus_path():
+    # Copy of the corpus the database was last populated from, to tell which
+    # sentences the next one adds or removes
+    return get_tatoeba_corpus_path() + '.previous'
+
+
 def write_tatoeba_corpus_csv(langCode1, langCode2, merged_corpus_dict):
-    corpus_out_file_path = join(DATA_DIR, langCode1 + '_' + langCode2 + '.csv')
+    corpus_out_file_path = get_tatoeba_corpus_path(langCode1, langCode2)
     with open(corpus_out_file_path, mode='w', encoding='utf-8') as corpus_fd:
         for key, value in merged_corpus_dict.items():
             corpus_fd.write('%s\t%s\n' % (key, value))
 
 
 def get_tatoeba_corpus_dict(langCode1='eng', langCode2="cmn"):
-    corpus_in_file_path = join(DATA_DIR, langCode1 + '_' + langCode2 + '.csv')
+    return read_tatoeba_corpus_csv(get_tatoeba_corpus_path(langCode1, langCode2))
+
+
+def read_tatoeba_corpus_csv(corpus_in_file_path):
     with open(corpus_in_file_path, mode='r', encoding='utf-8') as corpus_fd:
         corpus_dict = {cols[0]: cols[1] for cols in reader(corpus_fd, delimiter="\t")}
         return corpus_dict
 
-    return
+
+def get_changed_sentences(sentence_corpus, previous_corpus_hash):
+    """Return an index of the sentences added to or removed from the corpus
+    since the database was populated, or None if the corpus it was
+    populated from was not kept."""
+
+    previous_corpus_path = get_previous_corpus_path()
+    if not isfile(previous_corpus_path) or hash_file(previous_corpus_path) != previous_corpus_hash:
+        return None
+
+    previous_corpus = read_tatoeba_corpus_csv(previous_corpus_path)
+    changed = set(previous_corpus.items()) ^ set(sentence_corpus.items())
+    # Keyed on both sentences, since a changed translation appears twice
+    return SentenceIndex({sentences: sentences[1] for sentences in changed})
 
 
 TATOEBA_DOWNLOAD_ROOT = "https://downloads.tatoeba.org:443/exports/"
@@ -225,11 +643,9 @@ def download_tatoeba_lang_corpora(langCode):
             text='Downloading tatoeba \'%s\' language corpora' % langCode
     ).cyan.bold.dots12 as spinner:
         tatoeba_corpus_download_url = TATOEBA_LANGUAGE_ROOT + langCode + "/" + lang_filename
-        headers = {"Accept-Encoding": "gzip, deflate"}
-        corpora_bz2 = get(tatoeba_corpus_download_url, headers=headers).content
-        with BZ2File(BytesIO(corpora_bz2), mode='r') as bz2_file:
-            csv_file = bz2_file.read().decode('utf-8').splitlines()
-
+        lang_path = join(DATA_DIR, lang_filename)
+        fetch(tatoeba_corpus_download_url, lang_path)
+        with bz2open(lang_path, mode='rt', encoding='utf-8', newline='') as csv_file:
             corpora_dict = {cols[0]: cols[2] for cols in reader(csv_file, delimiter="\t")}
 
             spinner.ok()
@@ -242,12 +658,18 @@ def get_corpora_links():
             text='Downloading Tatoeba Corpus Link File'
     ).cyan.bold.dots12 as spinner:
         tatoeba_corpora_links_download_url = TATOEBA_DOWNLOAD_ROOT + "links.tar.bz2"
-        # headers = {"Accept-Encoding": "gzip, deflate"}
-        corpora_links_bz2 = get(tatoeba_corpora_links_download_url).content
-
-        with taropen(fileobj=BytesIO(corpora_links_bz2), mode="r:bz2") as link_tar:
-            link_csv = link_tar.extractfile(link_tar.getmember('links.csv')).read().decode('ascii').splitlines()
-            link_dict = {cols[0]: cols[1] for cols in reader(link_csv, delimiter="\t")}
+        links_path = join(DATA_DIR, "links.tar.bz2")
+        fetch(tatoeba_corpora_links_download_url, links_path)
+
+        # Read as a stream, decompressing the archive only once
+        with taropen(links_path, mode="r|bz2") as link_tar:
+            for member in link_tar:
+                if member.name == 'links.csv':
+                    link_csv = (line.decode('ascii') for line in link_tar.extractfile(member))
+                    link_dict = {cols[0]: cols[1] for cols in reader(link_csv, delimiter="\t")}
+                    break
+            else:
+                raise KeyError('links.csv not found in %s' % links_path)
 
             spinner.ok()
             return link_dict
@@ -266,62 +688,25 @@ def merge_corporas(corpora1: dict, corpora2: dict, links: dict):
         return merged_corpora
 
 
-def process_dictionary_entry(dictionary_entry, db_cursor):
+def process_dictionary_entry(dictionary_entry, merged_entries):
     for dictionary_field, dictionary_value in dictionary_entry.items():
         if dictionary_field in TO_LOWER:
             dictionary_entry[dictionary_field] = dictionary_value.lower()
 
-    try:
-        db_cursor.execute(
-            'INSERT INTO cidian ({}) VALUES ({})'.format(
-                ','.join(dictionary_entry.keys()),
-                ', '.join(['?'] * len(dictionary_entry))
-            ),
-            list(dictionary_entry.values()),
-        )
-    except IntegrityError:
-        if 'jyutping' in dictionary_entry:
-            db_cursor.execute(
-                'UPDATE cidian '
-                'SET jyutping=?, english_hk=? '
-                'WHERE traditional=? AND pinyin=?',
-                (
-                    dictionary_entry['jyutping'],
-                    dictionary_entry['english_hk'],
-                    dictionary_entry['traditional'],
-                    dictionary_entry['pinyin'],
-                ),
-            )
-            return
+    key = (dictionary_entry['traditional'], dictionary_entry['pinyin'])
+    old = merged_entries.get(key)
+    if old is None:
+        merged_entries[key] = dictionary_entry
+        return
 
-        db_cursor.execute(
-            'SELECT english, german, french, english_usage '
-            'FROM cidian '
-            'WHERE traditional=? AND pinyin=?',
-            (dictionary_entry['traditional'], dictionary_entry['pinyin']),
-        )
-        english, german, french, english_usage = db_cursor.fetchone()
-        old = {'english': english, 'german': german, 'french': french}
-        for dictionary_field in old:
-            if dictionary_field in dictionary_entry:
-                dictionary_entry[dictionary_field] = merge_definitions(old[dictionary_field], dictionary_entry[dictionary_field])
-            else:
-                dictionary_entry[dictionary_field] = old[dictionary_field]
-
-        #The english usage field is overwritten universally since the new dict vs an old/duplicate entry will contain the same data based on the logic in populate_usage_sentences
-        db_cursor.execute(
-            'UPDATE cidian '
-            'SET english=?, german=?, french=?, english_usage=?'
-            'WHERE traditional=? AND pinyin=?',
-            (
-                dictionary_entry['english'],
-                dictionary_entry['german'],
-                dictionary_entry['french'],
-                dictionary_entry['english_usage'],
-                dictionary_entry['traditional'],
-                dictionary_entry['pinyin'],
-            ),
-        )
+    if 'jyutping' in dictionary_entry:
+        old['jyutping'] = dictionary_entry['jyutping']
+        old['english_hk'] = dictionary_entry['english_hk']
+        return
+
+    for dictionary_field in ['english', 'german', 'french']:
+        if dictionary_field in dictionary_entry:
+            old[dictionary_field] = merge_definitions(old.get(dictionary_field), dictionary_entry[dictionary_field])
 
 
 def parse_definitions(rawDictionaryLine, lang):
@@ -354,20 +739,22 @@ def merge_definitions(definition1, definition2):
 
 def create_hanzi_table(db_cursor):
     db_cursor.execute('CREATE TABLE hanzi (%s)' % ', '.join(HANZI_COLS))
-    db_cursor.execute('CREATE UNIQUE INDEX icp ON hanzi (cp)')
 
     return
 
 
 def populate_hanzi(db_cursor):
     with yaspin(text='Importing Unihan database').cyan.bold.dots12 as spinner:
-        for unihan_node in get_unihan_entries():
-            db_cursor.execute(
-                'INSERT INTO hanzi ({}) VALUES ({})'.format(
-                    ','.join(unihan_node.keys()), ', '.join(['?'] * len(unihan_node))
-                ),
-                list(unihan_node.values()),
-            )
+        insert_rows(
+            db_cursor,
+            'hanzi',
+            HANZI_COLS,
+            number_rows(
+                [unihan_node.get(col) for col in HANZI_COLS]
+                for unihan_node in get_unihan_entries()
+            ),
+        )
+        db_cursor.execute('CREATE UNIQUE INDEX icp ON hanzi (cp)')
         spinner.ok()
 
     print(
@@ -379,29 +766,72 @@ def populate_hanzi(db_cursor):
     return
 
 
-def get_unihan_entries():
-    with open(join(DATA_DIR, UNIHAN_INFO['out_filename']), encoding='utf-8') as unihan_fd:
-        data = unihan_fd.read()
+def update_hanzi(db_cursor):
+    with yaspin(text='Reading Unihan database').cyan.bold.dots12 as spinner:
+        unihan_rows = {}
+        for unihan_node in get_unihan_entries():
+            unihan_rows[(unihan_node['cp'],)] = [unihan_node.get(col) for col in HANZI_COLS]
+        spinner.ok()
+
+    write_changes(
+        db_cursor,
+        'hanzi',
+        HANZI_COLS,
+        read_rows(db_cursor, 'hanzi', HANZI_COLS, ['cp']),
+        unihan_rows,
+    )
+
+    return
+
+
+@contextmanager
+def open_unihan():
+    """Open the Unihan XML as a binary stream, straight from the downloaded
+    zip if there is one, or else from an already extracted copy."""
+
+    zip_path = join(DATA_DIR, UNIHAN_INFO['zip_filename'])
+    if isfile(zip_path):
+        with ZipFile(zip_path) as unihan_zip:
+            with unihan_zip.open(UNIHAN_INFO['out_filename']) as unihan_fd:
+                yield unihan_fd
+    else:
+        with open(join(DATA_DIR, UNIHAN_INFO['out_filename']), 'rb') as unihan_fd:
+            yield unihan_fd
 
-    for char in finditer('<char (.*?)/>', data):
-        unihan_dict = {
-            pair.group(1): pair.group(2)
-            for pair in finditer('([a-zA-Z0-9_]*)="(.*?)"', char.group(1))
-        }
-        if unihan_dict.get('kMandarin') or unihan_dict.get('kCantonese'):
-            for unihan_field in list(unihan_dict):
-                if unihan_field not in HANZI_COLS:
-                    unihan_dict.pop(unihan_field)
-                    continue
-                if unihan_dict[unihan_field].startswith('U+'):
-                    unihan_dict[unihan_field] = ', '.join(
-                        [
-                            chr(int(codepoint, 16))
-                            for codepoint in unihan_dict[unihan_field].replace('U+', '').split()
-                        ]
-                    )
-            unihan_dict['cp'] = chr(int(unihan_dict['cp'], 16))
-            yield unihan_dict
+
+def get_unihan_entries():
+    # The file is hundreds of MB: parse it as a stream, and drop each
+    # element from the tree once its columns have been read
+    with open_unihan() as unihan_fd:
+        parents = []
+        for event, char in iterparse(unihan_fd, events=('start', 'end')):
+            if event == 'start':
+                parents.append(char)
+                continue
+            parents.pop()
+            if char.tag.rpartition('}')[2] != 'char':
+                continue
+            unihan_dict = {
+                unihan_field: char.attrib[unihan_field]
+                for unihan_field in HANZI_COLS
+                if unihan_field in char.attrib
+            }
+            parents[-1].remove(char)
+            if unihan_dict.get('kMandarin') or unihan_dict.get('kCantonese'):
+                yield convert_unihan_entry(unihan_dict)
+
+
+def convert_unihan_entry(unihan_dict):
+    for unihan_field in list(unihan_dict):
+        if unihan_dict[unihan_field].startswith('U+'):
+            unihan_dict[unihan_field] = ', '.join(
+                [
+                    chr(int(codepoint, 16))
+                    for codepoint in unihan_dict[unihan_field].replace('U+', '').split()
+                ]
+            )
+    unihan_dict['cp'] = chr(int(unihan_dict['cp'], 16))
+    return unihan_dict
 
 
 def write_license():
@@ -423,11 +853,11 @@ def write_unihan_license_section(license_fd):
         '#########################\n'
         'This database contains an extract of the Unihan database\n\n'
     )
-    with open(
-            join(DATA_DIR, UNIHAN_INFO['out_filename']), encoding='utf-8'
-    ) as unihan_fd:
+    with open_unihan() as unihan_fd:
         comments = [
-            c.group(1) for c in finditer('<!--(.*?)-->', unihan_fd.read())
+            c.group(1)
+            for line in TextIOWrapper(unihan_fd, encoding='utf-8')
+            for c in finditer('<!--(.*?)-->', line)
         ]
     license_fd.write(''.join(comments) + '\n\n')
     return
@@ -507,10 +937,10 @@ def create_and_populate_hanzi():
     return
 
 
-def create_and_populate_words():
+def create_and_populate_words(jobs=1):
     db_connection, db_cursor = open_db_connection()
     create_words_table(db_cursor)
-    populate_words(db_cursor)
+    populate_words(db_cursor, jobs)
 
     db_connection.commit()
     db_connection.close()
@@ -518,12 +948,129 @@ def create_and_populate_words():
     return
 
 
-def populate_all():
-    with yaspin(text='Updating COPYING.txt').cyan.bold.dots12 as spinner:
-        write_license()
+def hash_file(path):
+    file_hash = sha256()
+    with open(path, 'rb') as source_fd:
+        for chunk in iter(lambda: source_fd.read(DOWNLOAD_CHUNK_SIZE), b''):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def hash_sources():
+    """Return the hash of the downloaded file each source is read from."""
+
+    source_paths = {
+        dictionary_definition['name']: join(DATA_DIR, dictionary_definition['out_filename'])
+        for dictionary_definition in DICT_DEFINITION_INVENTORY
+    }
+    source_paths[UNIHAN_INFO['name']] = join(DATA_DIR, UNIHAN_INFO['zip_filename'])
+    if not isfile(source_paths[UNIHAN_INFO['name']]):
+        source_paths[UNIHAN_INFO['name']] = join(DATA_DIR, UNIHAN_INFO['out_filename'])
+    source_paths[TATOEBA_NAME] = get_tatoeba_corpus_path()
+
+    with yaspin(text='Hashing sources').cyan.bold.dots12 as spinner:
+        source_hashes = {name: hash_file(path) for name, path in source_paths.items()}
+        spinner.ok()
+    return source_hashes
+
+
+def read_source_hashes(db_cursor):
+    if not db_cursor.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'sources'"
+    ).fetchone():
+        return {}
+    return dict(db_cursor.execute('SELECT name, sha256 FROM sources'))
+
+
+def record_sources(db_cursor, source_hashes):
+    db_cursor.execute(
+        'CREATE TABLE IF NOT EXISTS sources (name PRIMARY KEY, sha256)'
+    )
+    db_cursor.executemany(
+        'INSERT OR REPLACE INTO sources (name, sha256) VALUES (?, ?)',
+        source_hashes.items(),
+    )
+    copyfile(get_tatoeba_corpus_path(), get_previous_corpus_path())
+
+    return
+
+
+def optimize(vacuum=True):
+    with yaspin(text='Analyzing database').cyan.bold.dots12 as spinner:
+        conn = connect(DB_PATH)
+        conn.execute('analyze')
+        if vacuum:
+            conn.execute('vacuum')
+        conn.commit()
+        conn.close()
         spinner.ok()
+
+    return
+
+
+def populate_all(jobs=1, vacuum=True):
+    source_hashes = hash_sources()
     create_and_populate_hanzi()
-    create_and_populate_words()
+    create_and_populate_words(jobs)
+
+    db_connection, db_cursor = open_db_connection()
+    record_sources(db_cursor, source_hashes)
+    db_connection.commit()
+    db_connection.close()
+
+    optimize(vacuum)
+
+    return
+
+
+def update_all(jobs=1):
+    """Apply only what changed in the sources since the database was
+    populated, which is rebuilt if it has no record of them."""
+
+    previous_hashes = {}
+    if isfile(DB_PATH):
+        # The database is modified in place: keep the rollback journal
+        db_connection, db_cursor = open_db_connection(pragmas={})
+        previous_hashes = read_source_hashes(db_cursor)
+        if not previous_hashes:
+            db_connection.close()
+            remove(DB_PATH)
+            print('No sources recorded, rebuilding', DB_PATH)
+    if not previous_hashes:
+        populate_all(jobs)
+        return
+
+    source_hashes = hash_sources()
+    changed_sources = {
+        name for name, source_hash in source_hashes.items()
+        if previous_hashes.get(name) != source_hash
+    }
+    if not changed_sources:
+        db_connection.close()
+        print('All sources unchanged since the last update')
+        return
+
+    print('Changed sources:', ', '.join(sorted(changed_sources)))
+
+    if UNIHAN_INFO['name'] in changed_sources:
+        update_hanzi(db_cursor)
+
+    if changed_sources - {UNIHAN_INFO['name']}:
+        sentence_corpus = get_tatoeba_corpus_dict()
+        if TATOEBA_NAME in changed_sources:
+            changed_sentences = get_changed_sentences(
+                sentence_corpus, previous_hashes.get(TATOEBA_NAME)
+            )
+        else:
+            changed_sentences = SentenceIndex({})
+        update_words(db_cursor, sentence_corpus, changed_sentences, jobs)
+
+    record_sources(db_cursor, source_hashes)
+    db_connection.commit()
+    db_connection.close()
+
+    # Small changes leave little to reclaim
+    optimize(vacuum=False)
 
     return
 
@@ -579,13 +1126,19 @@ def main():
     parser.add_argument(
         '--update',
         action='store_true',
-        help='update (removes, downloads and populates dict)',
+        help='update (downloads and applies what changed to the dict)',
     )
     parser.add_argument(
         '--all',
         action='store_true',
         help='run all actions',
     )
+    parser.add_argument(
+        '--jobs',
+        type=int,
+        default=cpu_count() or 1,
+        help='number of processes matching usage sentences',
+    )
     args = parser.parse_args()
 
     if args.all:
@@ -593,15 +1146,13 @@ def main():
             remove(DB_PATH)
             print('Deleted', DB_PATH)
         download_all()
-        populate_all()
+        # cleanup() vacuums once the indexes are dropped
+        populate_all(args.jobs, vacuum=False)
         cleanup()
         zip_data()
     elif args.update:
-        if isfile(DB_PATH):
-            remove(DB_PATH)
-            print('Deleted', DB_PATH)
         download_all()
-        populate_all()
+        update_all(args.jobs)
     else:
         if args.delete and isfile(DB_PATH):
             remove(DB_PATH)
@@ -609,7 +1160,7 @@ def main():
         if args.download:
             download_all()
         if args.populate:
-            populate_all()
+            populate_all(args.jobs)
         if args.cleanup:
             cleanup()
         if args.zip:
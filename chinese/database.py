@@ -19,87 +19,360 @@
 
 import sqlite3
 from os.path import dirname, join, realpath
+from bisect import bisect_left
+from collections import OrderedDict
+from contextlib import closing
+from functools import wraps
+from urllib.parse import quote
+from threading import Lock, get_ident
 
 from .util import add_with_space
 
+# Keep well below SQLITE_MAX_VARIABLE_NUMBER (999 on older builds); each word
+# is bound twice, once for each of the traditional and simplified columns.
+BATCH_SIZE = 400
+
+# Default number of lookup results kept in memory by each Dictionary
+CACHE_SIZE = 20000
+
+# Applied to each read-only connection: map the file into memory instead of
+# copying pages into SQLite's cache, keep a modest page cache per thread, and
+# refuse writes outright
+PRAGMAS = {
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -8 * 1024,
+    'query_only': 'ON',
+    'temp_store': 'MEMORY',
+}
+
+
+def chunks(a, n=BATCH_SIZE):
+    for i in range(0, len(a), n):
+        yield a[i : i + n]
+
+
+# Variant entries in databases built before update.py flagged them with
+# is_variant
+NO_VARIANTS = (
+    "(english NOT LIKE '%variant%' OR english IS NULL) "
+    "AND (german NOT LIKE '%variant%' OR german IS NULL) "
+    "AND (french NOT LIKE '%variant%' OR french IS NULL)"
+)
+
+
+def word_query(columns, where='', order=''):
+    """Build a query for the cidian entries whose either form is a word.
+
+    A single WHERE traditional = ? OR simplified = ? cannot use a plain index
+    seek, so the two forms are looked up separately, each through its own
+    index, and the results concatenated. Entries whose traditional and
+    simplified forms are identical are only returned by the first lookup.
+    """
+
+    return (
+        'SELECT {columns} FROM cidian '
+        'WHERE traditional = :word {where} '
+        'UNION ALL '
+        'SELECT {columns} FROM cidian '
+        'WHERE simplified = :word AND traditional != :word {where} '
+        '{order}'
+    ).format(columns=columns, where=where, order=order)
+
+
+# Position of the reading in a word index entry, by lookup type
+READING = {'trad': 2, 'simp': 3}
+
+
+def unique(a):
+    return list(dict.fromkeys(a))
+
+
+class PrefixIndex:
+    """In-memory word index answering longest-match (maximal munch) queries.
+
+    Words are kept in a sorted array, so all words sharing a prefix sit next
+    to each other: one bisection tells whether a candidate is a word and
+    whether any longer word can still follow it. This extends a match one
+    character at a time without touching the database, at a fraction of the
+    memory a dict-of-dicts trie would need.
+    """
+
+    def __init__(self, mapping):
+        self.words = sorted(mapping)
+        self.values = [mapping[w] for w in self.words]
+
+    def __len__(self):
+        return len(self.words)
+
+    def get(self, word, default=None):
+        i = bisect_left(self.words, word)
+        if i < len(self.words) and self.words[i] == word:
+            return self.values[i]
+        return default
+
+    def longest_match(
+        self, text, start=0, min_len=1, max_len=None, accept=None
+    ):
+        """Return the longest word at text[start:] of at least min_len chars.
+
+        If given, accept(value) decides whether a word counts as a match.
+        """
+
+        end = len(text)
+        if max_len:
+            end = min(end, start + max_len)
+
+        found = None
+        lo = 0
+        for j in range(start + 1, end + 1):
+            s = text[start:j]
+            lo = bisect_left(self.words, s, lo)
+            if lo == len(self.words):
+                break
+            if self.words[lo] == s:
+                if j - start >= min_len and (
+                    accept is None or accept(self.values[lo])
+                ):
+                    found = s
+                following = lo + 1
+            else:
+                following = lo
+            if following == len(self.words):
+                break
+            if not self.words[following].startswith(s):
+                break
+        return found
+
+
+class LRUCache:
+    """Size-bounded mapping evicting the least recently used entries.
+
+    A maxsize of 0 disables caching altogether. Safe to share between threads.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.data)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.data),
+            'maxsize': self.maxsize,
+        }
+
+
+_missing = object()
+
+
+def cached(method):
+    """Memoize a Dictionary lookup in the instance's LRU cache.
+
+    Results are keyed on the method name and its arguments, so they must not
+    be mutated by callers.
+    """
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        key = (method.__name__, args, tuple(sorted(kwargs.items())))
+        value = self.cache.get(key, _missing)
+        if value is _missing:
+            value = method(self, *args, **kwargs)
+            self.cache.put(key, value)
+        return value
+
+    return wrapper
+
 
 class Dictionary:
-    def __init__(self):
+    def __init__(self, cache_size=None):
         self.db_path = join(dirname(realpath(__file__)), 'data', 'db', 'chinese.db')
-        self.conn = None
-        self.c = None
-        # FIXME: I would prefer not to call self.connect() here, but that causes
-        # problems with the unit tests due to import shenanigans.
-        # I don't feel like fixing that atm, so this is a workaround for now.
-        self.connect()
+        # SQLite connections are not shared between threads: each thread
+        # (e.g. a background bulk fill) gets its own read-only one, keyed by
+        # thread id, and every query runs on a fresh cursor.
+        self.connections = {}
+        self.lock = Lock()
+        self.index_lock = Lock()
+        self.prefetched = {}
+        self.index = None
+        self.cache = LRUCache(CACHE_SIZE if cache_size is None else cache_size)
+        # Connections are opened by the first query on each thread
+
+    @property
+    def conn(self):
+        """Connection of the calling thread, connecting it on first use."""
+
+        try:
+            return self.connections[get_ident()]
+        except KeyError:
+            self.connect()
+            return self.connections[get_ident()]
+
+    def execute(self, sql, params=()):
+        """Run a query on the calling thread's connection and return the
+        cursor holding its results."""
+
+        return self.conn.execute(sql, params)
 
     def connect(self) -> None:
-        if not self.conn:
-            self.conn = sqlite3.connect(self.db_path)
-            self.c = self.conn.cursor()
+        if get_ident() not in self.connections:
+            # Only ever used by the thread that opened it, but close() may
+            # run on another one.
+            conn = sqlite3.connect(
+                'file:%s?mode=ro' % quote(self.db_path),
+                uri=True,
+                check_same_thread=False,
+            )
+            for name, value in PRAGMAS.items():
+                conn.execute('PRAGMA %s = %s' % (name, value))
+            with self.lock:
+                self.connections[get_ident()] = conn
 
     def close(self) -> None:
-        try:  # I have occasionally gotten this error, not sure why.
-            self.conn.close()
-            self.conn = None
-        except AttributeError:
-            pass
+        self.invalidate()
+        with self.lock:
+            connections, self.connections = self.connections, {}
+        for conn in connections.values():
+            conn.close()
+
+    def invalidate(self):
+        """Forget everything read from the database, e.g. after a rebuild."""
+
+        self.index = None
+        self.prefetched = {}
+        self.cache.clear()
 
     def create_indices(self):
-        self.c.execute(
-            'CREATE INDEX IF NOT EXISTS isimplified ON cidian (simplified)'
-        )
-        self.c.execute(
-            'CREATE UNIQUE INDEX IF NOT EXISTS itraditional '
-            'ON cidian (traditional, pinyin)'
+        # The only write, so it gets a connection of its own
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            conn.execute(
+                'CREATE INDEX IF NOT EXISTS isimplified ON cidian (simplified)'
+            )
+            conn.execute(
+                'CREATE UNIQUE INDEX IF NOT EXISTS itraditional '
+                'ON cidian (traditional, pinyin)'
+            )
+            conn.commit()
+
+    def _word_index(self):
+        """Return an in-memory index of every dictionary entry.
+
+        Each traditional and simplified form maps to a tuple of
+        (traditional, simplified, trad_reading, simp_reading). The forms come
+        from the first entry matching the word, trying the traditional column
+        before the simplified one. A reading is the (pinyin, pinyin_tw) of
+        the first non-variant entry with that traditional or simplified form,
+        or None. "First" follows the itraditional (traditional, pinyin) and
+        isimplified (simplified, rowid) indices, the order in which these
+        used to be looked up one query at a time.
+        """
+
+        if self.index is None:
+            # Threads asking at the same time wait for a single build
+            with self.index_lock:
+                if self.index is None:
+                    self.index = self._build_word_index()
+        return self.index
+
+    def _build_word_index(self):
+        columns = {row[1] for row in self.execute('PRAGMA table_info(cidian)')}
+        no_variants = 'NOT is_variant' if 'is_variant' in columns else NO_VARIANTS
+        rows = self.execute(
+            'SELECT traditional, simplified, pinyin, pinyin_tw, '
+            'LENGTH(pinyin) > 0 AND %s FROM cidian ORDER BY rowid' % no_variants
         )
-        self.conn.commit()
 
-    def _get_word_pinyin(self, word, type_, prefer_tw=False, no_variants=True):
-        from .transcribe import accentuate
+        forms = {}
+        by_trad = {}
+        by_simp = {}
+        readings = {}
+        for t, s, pinyin, pinyin_tw, has_reading in rows:
+            if t not in by_trad or (pinyin or '') < by_trad[t][0]:
+                by_trad[t] = (pinyin or '', (t, s))
+            forms.setdefault(s, (t, s))
+            if has_reading:
+                reading = (pinyin, pinyin_tw)
+                if t not in readings or pinyin < readings[t][0]:
+                    readings[t] = reading
+                by_simp.setdefault(s, reading)
+
+        for t, (_, form) in by_trad.items():
+            forms[t] = form
+
+        return PrefixIndex(
+            {
+                word: (*form, readings.get(word), by_simp.get(word))
+                for word, form in forms.items()
+                if word
+            }
+        )
 
-        if type_ == 'trad':
-            query = 'SELECT pinyin, pinyin_tw FROM cidian WHERE traditional=?'
-        elif type_ == 'simp':
-            query = 'SELECT pinyin, pinyin_tw FROM cidian WHERE simplified=?'
-        else:
-            raise ValueError(type_)
+    @cached
+    def _get_word_pinyin(self, word, type_, prefer_tw=False):
+        entry = self._word_index().get(word)
+        if not entry or not entry[READING[type_]]:
+            return None
+        return self._format_pinyin(*entry[READING[type_]], prefer_tw)
 
-        if no_variants:
-            query += """AND (english NOT LIKE '%variant%' OR english IS NULL)
-                        AND (german NOT LIKE '%variant%' OR german IS NULL)
-                        AND (french NOT LIKE '%variant%' OR french IS NULL)"""
+    def _format_pinyin(self, pinyin, pinyin_tw, prefer_tw=False):
+        from .transcribe import accentuate
 
-        self.c.execute(query, (word,))
-        res = self.c.fetchone()
-        if not res:
-            return None
-        pinyin, pinyin_tw = res
         if prefer_tw and pinyin_tw:
-            return ' '.join(
-                accentuate(list(map(str.lower, pinyin_tw.split())), 'pinyin')
-            )
-        if pinyin:
-            return ' '.join(
-                accentuate(list(map(str.lower, pinyin.split())), 'pinyin')
-            )
-        if no_variants:
-            s = self._get_word_pinyin(self, word, prefer_tw, False)
-            return ' '.join(
-                accentuate(list(map(str.lower, s.split())), 'pinyin')
-            )
+            pinyin = pinyin_tw
+        if not pinyin:
+            return None
+        return ' '.join(
+            accentuate(list(map(str.lower, pinyin.split())), 'pinyin')
+        )
 
+    @cached
     def _get_word_jyutping(self, word, type_):
         if type_ == 'trad':
             query = 'SELECT jyutping FROM cidian WHERE traditional=?'
         elif type_ == 'simp':
             query = 'SELECT jyutping FROM cidian WHERE simplified=?'
-        self.c.execute(query, (word,))
-        res = self.c.fetchone()
+        res = self.execute(query, (word,)).fetchone()
         if not res:
             return None
         return res[0]
 
+    @cached
     def get_pinyin(self, word, type_, prefer_tw=False, word_len=4):
         p = self._get_word_pinyin(word, type_, prefer_tw)
         if p:
@@ -107,38 +380,47 @@ class Dictionary:
         if len(word) == 1:
             return self._get_char(word, 'pinyin')
 
-        # Try each 4-character sequence in turn, then 3-sequence, then
-        # 2-sequence and if those fails, do unit lookup.
+        # Take the longest dictionary word (of up to word_len characters) at
+        # each position, falling back to a single character lookup. A lone
+        # final character is looked up as a word first.
 
+        col = READING[type_]
+        index = self._word_index()
         result = ''
-        word = word[:]
         last_was_pinyin = False
-        while len(word) > 0:
-            word_was_found = False
-
-            while word_len > 1:
-                p = self._get_word_pinyin(word[:word_len], type_, prefer_tw)
-                if p:
-                    result = add_with_space(result, p)
-                    word = word[word_len:]
-                    last_was_pinyin = True
-                    word_was_found = True
-                    break
-                word_len -= 1
-
-            if not word_was_found:
-                p = self._get_char(word[0], 'pinyin')
-                if p:
-                    result = add_with_space(result, p)
-                    last_was_pinyin = True
-                else:
-                    if last_was_pinyin:
-                        result += ' '
-                    result += word[0]
-                    last_was_pinyin = False
-                word = word[1:]
+        i = 0
+        while i < len(word):
+            min_len = min(2, len(word) - i)
+            match = index.longest_match(
+                word, i, min_len, word_len, accept=lambda e: e[col]
+            )
+            if match:
+                p = self._format_pinyin(*index.get(match)[col], prefer_tw)
+                result = add_with_space(result, p)
+                last_was_pinyin = True
+                i += len(match)
+                continue
+
+            p = self._get_char(word[i], 'pinyin')
+            if p:
+                result = add_with_space(result, p)
+                last_was_pinyin = True
+            else:
+                if last_was_pinyin:
+                    result += ' '
+                result += word[i]
+                last_was_pinyin = False
+            i += 1
         return result
 
+    def get_pinyin_batch(self, words, type_, prefer_tw=False):
+        """Batch version of get_pinyin, returning a dict keyed by word."""
+
+        return {
+            word: self.get_pinyin(word, type_, prefer_tw)
+            for word in unique(filter(None, words))
+        }
+
     def get_cantonese(self, word, type_):
         return self._get_word_jyutping(word, type_)
 
@@ -148,6 +430,7 @@ class Dictionary:
     def get_simplified(self, word, word_len=4):
         return self.get_word(word, word_len, type_='simp')
 
+    @cached
     def get_word(self, word, word_len=4, type_='trad'):
         p = self._get_word(word, type_)
         if p:
@@ -156,33 +439,31 @@ class Dictionary:
         if len(word) == 1:
             return self._get_char(word, type_)
 
-        # Try each 4-character sequence in turn, then 3-sequence, then
-        # 2-sequence and if those fails, do unit lookup.
+        # Take the longest dictionary word (of up to word_len characters) at
+        # each position, falling back to a single character lookup. A lone
+        # final character is looked up as a word first.
 
+        index = self._word_index()
         result = ''
-        word = word[:]
-        while len(word) > 0:
-            word_was_found = False
-
-            while word_len > 1:
-                p = self._get_word(word[:word_len], type_)
-                if p:
-                    result += p
-                    word = word[word_len:]
-                    word_was_found = True
-                    break
-                word_len -= 1
-
-            if not word_was_found:
-                p = self._get_char(word[0], type_)
-                if p:
-                    result += p
-                else:
-                    result += word[0]
-                word = word[1:]
+        i = 0
+        while i < len(word):
+            min_len = min(2, len(word) - i)
+            match = index.longest_match(word, i, min_len, word_len)
+            if match:
+                result += self._get_word(match, type_)
+                i += len(match)
+                continue
+
+            p = self._get_char(word[i], type_)
+            if p:
+                result += p
+            else:
+                result += word[i]
+            i += 1
 
         return result
 
+    @cached
     def _get_char(self, c, type_):
         to_col = {
             'trad': 'kTraditionalVariant',
@@ -191,77 +472,164 @@ class Dictionary:
             'canto': 'kCantonese',
         }
 
-        self.c.execute('SELECT %s FROM hanzi WHERE cp = ?' % to_col[type_], c)
+        rows = self.execute(
+            'SELECT %s FROM hanzi WHERE cp = ?' % to_col[type_], c
+        )
         try:
-            (k,) = self.c.fetchone()
+            (k,) = rows.fetchone()
             return k
         except:
             return None
 
     def _get_word(self, word, type_):
-        to_col = {'trad': 'traditional', 'simp': 'simplified'}
+        to_col = {'trad': 0, 'simp': 1}
 
-        self.c.execute(
-            'SELECT %s FROM cidian '
-            'WHERE traditional = :word '
-            'OR simplified = :word' % to_col[type_],
-            {'word': word},
-        )
-        try:
-            (k,) = self.c.fetchone()
-            return k
-        except:
+        entry = self._word_index().get(word)
+        if not entry:
             return None
-
+        return entry[to_col[type_]]
+
+    def _select_words(self, columns, words, where='', order=''):
+        """Yield (word, row) for every entry matching one of words.
+
+        An entry matches a word if either its traditional or its simplified
+        form is that word. Words are queried in chunks with IN (...).
+        """
+
+        words = unique(filter(None, words))
+        for chunk in chunks(words):
+            params = '(%s)' % ', '.join('?' * len(chunk))
+            rows = self.execute(
+                (
+                    'SELECT traditional, simplified, {columns} FROM cidian '
+                    'WHERE traditional IN {params} {where} '
+                    'UNION ALL '
+                    'SELECT traditional, simplified, {columns} FROM cidian '
+                    'WHERE simplified IN {params} '
+                    'AND traditional NOT IN {params} {where} '
+                    '{order}'
+                ).format(
+                    columns=columns, params=params, where=where, order=order
+                ),
+                chunk * 3,
+            )
+            wanted = set(chunk)
+            for trad, simp, *row in rows.fetchall():
+                for word in {trad, simp} & wanted:
+                    yield word, tuple(row)
+
+    def _group_words(self, columns, words, where='', order=''):
+        words = unique(filter(None, words))
+        grouped = {w: [] for w in words}
+        for word, row in self._select_words(columns, words, where, order):
+            if row not in grouped[word]:
+                grouped[word].append(row)
+        return grouped
+
+    def prefetch(self, words):
+        """Answer the per-word lookups made by a bulk fill up front.
+
+        Subsequent calls to get_definitions, get_classifiers, get_variants
+        and get_sentences for any of these words are served from memory
+        until clear_prefetched is called.
+        """
+
+        words = unique(filter(None, words))
+        prefetched = {}
+        for lang in ['en', 'de', 'fr']:
+            for w, defs in self.get_definitions_batch(words, lang).items():
+                prefetched[('definitions', w, lang)] = defs
+        for w, cs in self.get_classifiers_batch(words).items():
+            prefetched[('classifiers', w)] = cs
+        for w, vs in self.get_variants_batch(words).items():
+            prefetched[('variants', w)] = vs
+        for w, s in self.get_sentences_batch(words).items():
+            prefetched[('sentences', w)] = s
+        self.prefetched = prefetched
+
+    def clear_prefetched(self):
+        self.prefetched = {}
+
+    @cached
     def get_definitions(self, word, lang):
         to_full = {'en': 'english', 'de': 'german', 'fr': 'french'}
 
-        self.c.execute(
-            'SELECT DISTINCT pinyin, %s AS definition, classifiers, variants '
-            'FROM cidian '
-            'WHERE (traditional = :word OR simplified = :word) '
-            'AND LENGTH(definition) > 0 '
-            'ORDER BY pinyin' % to_full[lang],
+        if ('definitions', word, lang) in self.prefetched:
+            return self.prefetched[('definitions', word, lang)]
+
+        rows = self.execute(
+            word_query(
+                'pinyin, %s AS definition, classifiers, variants'
+                % to_full[lang],
+                where='AND LENGTH(definition) > 0',
+                order='ORDER BY pinyin',
+            ),
             {'word': word},
         )
         try:
-            return self.c.fetchall()
+            return unique(rows.fetchall())
         except:
             return []
 
+    def get_definitions_batch(self, words, lang):
+        to_full = {'en': 'english', 'de': 'german', 'fr': 'french'}
+
+        return self._group_words(
+            'pinyin, %s AS definition, classifiers, variants' % to_full[lang],
+            words,
+            where='AND LENGTH(definition) > 0',
+            order='ORDER BY pinyin',
+        )
+
+    @cached
     def get_classifiers(self, word):
         if not word:
             return []
-        self.c.execute(
-            (
-                'SELECT DISTINCT classifiers FROM cidian '
-                'WHERE (traditional = :word OR simplified = :word)'
-            ),
-            {'word': word},
-        )
-        cs = list(filter(None, [c for (c,) in self.c.fetchall()]))
-        return ','.join(cs).split(',') if cs else []
+        if ('classifiers', word) in self.prefetched:
+            return self.prefetched[('classifiers', word)]
+        rows = self.execute(word_query('classifiers'), {'word': word})
+        return self._join_column(unique(rows.fetchall()))
+
+    def get_classifiers_batch(self, words):
+        return {
+            word: self._join_column(rows)
+            for word, rows in self._group_words('classifiers', words).items()
+        }
+
+    def _join_column(self, rows):
+        a = list(filter(None, [v for (v,) in rows]))
+        return ','.join(a).split(',') if a else []
 
+    @cached
     def get_variants(self, word):
-        self.c.execute(
-            (
-                'SELECT DISTINCT variants FROM cidian '
-                'WHERE (traditional = :word OR simplified = :word)'
-            ),
-            {'word': word},
-        )
-        vars = list(filter(None, [a for (a,) in self.c.fetchall()]))
-        return ','.join(vars).split(',') if vars else []
+        if ('variants', word) in self.prefetched:
+            return self.prefetched[('variants', word)]
+        rows = self.execute(word_query('variants'), {'word': word})
+        return self._join_column(unique(rows.fetchall()))
+
+    def get_variants_batch(self, words):
+        return {
+            word: self._join_column(rows)
+            for word, rows in self._group_words('variants', words).items()
+        }
 
+    @cached
     def get_sentences(self, word):
-        self.c.execute(
-            'SELECT DISTINCT english_usage '
-            'FROM cidian '
-            'WHERE (traditional = :word OR simplified = :word) '
-            'AND LENGTH(english_usage) > 0 ',
+        if ('sentences', word) in self.prefetched:
+            return self.prefetched[('sentences', word)]
+        rows = self.execute(
+            word_query('english_usage', where='AND LENGTH(english_usage) > 0'),
             {'word': word},
         )
         try:
-            return self.c.fetchone()
+            return rows.fetchone()
         except:
-            return []
\ No newline at end of file
+            return []
+
+    def get_sentences_batch(self, words):
+        grouped = self._group_words(
+            'english_usage',
+            words,
+            where='AND LENGTH(english_usage) > 0',
+        )
+        return {word: rows[0] if rows else None for word, rows in grouped.items()}
@@ -22,7 +22,6 @@ import aqt.editor
 from anki.hooks import addHook
 from aqt import gui_hooks, mw
 
-from .behavior import update_fields
 from .main import config
 
 
@@ -117,6 +116,9 @@ class EditManager:
 
         if not (note_type := note.note_type()):
             return changed
+        # The fill machinery is only imported once a Chinese note is edited
+        from .behavior import update_fields
+
         allFields = mw.col.models.field_names(note_type)
         field = allFields[index]
         if not update_fields(note, field, allFields):
@@ -20,12 +20,14 @@
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
 
-from time import sleep
+from time import monotonic
 
 from aqt import mw
+from aqt.operations import CollectionOp
 from aqt.utils import askUser, showInfo, showText
 
 from .behavior import (
+    FillContext,
     fill_all_defs,
     fill_all_rubies,
     fill_classifiers,
@@ -39,15 +41,25 @@ from .behavior import (
     fill_usage,
     update_fields,
 )
+from .database import chunks
 from .hanzi import get_hanzi
-from .main import config
+from .main import config, dictionary
+from .sound import speech_text
+from .tts import DownloadScheduler, get_audio_index
 from .util import (
     all_fields_empty,
+    apply_changes,
+    cleanup,
     get_first,
     has_any_field,
-    save_note,
 )
 
+# Number of notes loaded, filled and written back at a time
+CHUNK_SIZE = 500
+
+# Minimum number of seconds between two progress updates
+PROGRESS_INTERVAL = 0.2
+
 PROMPT_TEMPLATE = (
     '<div>This will update the {field_names} fields in the current deck.</div>'
     '<div>Please back up your Anki collection first!</div>'
@@ -70,6 +82,110 @@ END_TEMPLATE = (
 )
 
 
+def prefetch_hanzi(notes):
+    """Prefetch dictionary entries for the hanzi of notes."""
+
+    words = set()
+    for note in notes:
+        hanzi = get_first(config['fields']['hanzi'], dict(note))
+        if hanzi:
+            words.add(cleanup(hanzi))
+    dictionary.prefetch(words)
+
+
+def update_progress(label, value, max):
+    mw.taskman.run_on_main(
+        lambda: mw.progress.update(label=label, value=value, max=max)
+    )
+
+
+def fill_notes(
+    col,
+    note_ids,
+    fill,
+    undo_name,
+    label=None,
+    prefetch=False,
+    prepare=None,
+    chunk_size=CHUNK_SIZE,
+):
+    """Run fill(i, copy) over notes and save those whose fields changed.
+
+    fill edits copy, a dict of the i-th note's fields, in place. Notes are
+    loaded chunk_size at a time (prefetching dictionary entries for their
+    hanzi if asked to, and passing them to prepare if given), and the changed
+    ones written back with a single update_notes call per chunk. All writes
+    are merged into one undo entry.
+
+    If given, label(i, copy) formats the progress message, at most once every
+    PROGRESS_INTERVAL seconds. Cancelling the progress dialog stops the run,
+    keeping the notes filled so far.
+
+    Returns the OpChanges of the run and the number of notes updated.
+    """
+
+    undo_entry = col.add_custom_undo_entry(undo_name)
+    changes = None
+    n_updated = 0
+    last_update = 0
+    cancelled = False
+    i = 0
+
+    for chunk in chunks(note_ids, chunk_size):
+        notes = [col.get_note(nid) for nid in chunk]
+        if prefetch:
+            prefetch_hanzi(notes)
+        if prepare:
+            prepare(notes)
+
+        changed = []
+        for note in notes:
+            cancelled = mw.progress.want_cancel()
+            if cancelled:
+                break
+            copy = dict(note)
+            fill(i, copy)
+            if apply_changes(note, copy):
+                changed.append(note)
+            now = monotonic()
+            if label and now - last_update >= PROGRESS_INTERVAL:
+                last_update = now
+                update_progress(label(i, copy), i, len(note_ids))
+            i += 1
+
+        if changed:
+            col.update_notes(changed)
+            changes = col.merge_undo_entries(undo_entry)
+            n_updated += len(changed)
+        if cancelled:
+            break
+
+    if prefetch:
+        dictionary.clear_prefetched()
+    if changes is None:
+        changes = col.merge_undo_entries(undo_entry)
+    return changes, n_updated
+
+
+def run_fill(note_ids, fill, undo_name, done, **kwargs):
+    """Run fill_notes in the background, then call done(n_updated).
+
+    The main window stays responsive meanwhile. Dictionary lookups made by
+    fill go through a database connection of the background thread's own.
+    """
+
+    n_updated = 0
+
+    def op(col):
+        nonlocal n_updated
+        changes, n_updated = fill_notes(col, note_ids, fill, undo_name, **kwargs)
+        return changes
+
+    CollectionOp(parent=mw, op=op).success(
+        lambda changes: done(n_updated)
+    ).run_in_background()
+
+
 def bulk_fill_all():
     prompt = (
         '<div>This will update <i>all</i> non-audio fields in the current deck.</div>'
@@ -81,33 +197,31 @@ def bulk_fill_all():
         return
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
     n_updated = 0
     n_failed = 0  # FIXME
     exclude = config.get_fields(['sound', 'mandarinSound', 'cantoneseSound'])
 
-    for i, nid in enumerate(note_ids):
-        note = mw.col.get_note(nid)
-        fields = [
-            f
-            for f in mw.col.models.field_names(note.note_type())
-            if f not in exclude
-        ]
-        n_updated += update_fields(note, 'Hanzi', fields)
-        msg = PROGRESS_TEMPLATE % {
-            'hanzi': get_hanzi(dict(note)),
+    def fill(i, copy):
+        nonlocal n_updated
+        fields = [f for f in copy if f not in exclude]
+        n_updated += update_fields(copy, 'Hanzi', fields)
+
+    def label(i, copy):
+        return PROGRESS_TEMPLATE % {
+            'hanzi': get_hanzi(copy),
             'n_processed': i,
             'n_updated': n_updated,
             'n_failed': n_failed,
         }
 
-        mw.progress.update(label=msg, value=i)
-        mw.col.update_note(note)
+    def done(n_notes):
+        showInfo(
+            '<b>Bulk filling complete</b><br>'
+            '<b>Processed:</b> {}<br>'.format(len(note_ids))
+        )
 
-    mw.progress.finish()
-    showInfo(
-        '<b>Bulk filling complete</b><br>'
-        '<b>Processed:</b> {}<br>'.format(len(note_ids))
+    run_fill(
+        note_ids, fill, 'Bulk Fill All', done, label=label, prefetch=True
     )
 
 
@@ -115,8 +229,8 @@ def bulk_fill_sound():
     prompt = PROMPT_TEMPLATE.format(
         field_names='<i>Sound</i>',
         extra_info=(
-            '<div>There will be a 5 second delay between each sound request,'
-            ' so this may take a while.</div>'
+            '<div>Sound requests are rate limited, so this may take a while.'
+            '</div>'
         ),
     )
 
@@ -129,57 +243,87 @@ def bulk_fill_sound():
     d_already_had_sound = 0
     n_updated = 0
     n_failed = 0
+    # Audio downloaded by prepare, by text
+    filenames = {}
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, nid in enumerate(note_ids):
-        orig = mw.col.get_note(nid)
-        copy = dict(orig)
+    def fill(i, copy):
+        nonlocal d_has_fields, d_already_had_sound, n_updated, n_failed
 
         if has_any_field(copy, fields) and has_any_field(
-            config['fields']['hanzi'], copy
+            copy, config['fields']['hanzi']
         ):
             d_has_fields += 1
             hanzi = get_first(config['fields']['hanzi'], copy)
 
             if all_fields_empty(copy, fields):
-                msg = '''
-                <b>Processing:</b> %(hanzi)s<br>
-                <b>Updated:</b> %(n_updated)d notes<br>
-                <b>Failed:</b> %(n_failed)d notes''' % {
-                    'hanzi': get_hanzi(copy),
-                    'n_updated': n_updated,
-                    'n_failed': n_failed,
-                }
-                mw.progress.update(label=msg, value=i)
-                s, f = fill_sound(hanzi, copy)
+                s, f = fill_sound(hanzi, copy, filenames=filenames)
                 n_updated += s
                 n_failed += f
-                save_note(orig, copy)
-                sleep(5)
             else:
                 d_already_had_sound += 1
 
-    mw.progress.finish()
-    msg = '''
+    def label(i, copy):
+        return '''
+                <b>Processing:</b> %(hanzi)s<br>
+                <b>Updated:</b> %(n_updated)d notes<br>
+                <b>Failed:</b> %(n_failed)d notes''' % {
+            'hanzi': get_hanzi(copy),
+            'n_updated': n_updated,
+            'n_failed': n_failed,
+        }
+
+    def done(n_notes):
+        msg = '''
 %(n_updated)d new pronunciations downloaded
 
 %(n_failed)d downloads failed
 
 %(have)d/%(d_has_fields)d notes now have pronunciation''' % {
-        'n_updated': n_updated,
-        'n_failed': n_failed,
-        'have': d_already_had_sound + n_updated,
-        'd_has_fields': d_has_fields,
-    }
-    if n_failed > 0:
-        msg += (
-            'TTS is taken from an online source. '
-            'It may not always be fully responsive. '
-            'Please check your network connection, or retry later.'
-        )
-    showInfo(msg)
+            'n_updated': n_updated,
+            'n_failed': n_failed,
+            'have': d_already_had_sound + n_updated,
+            'd_has_fields': d_has_fields,
+        }
+        if n_failed > 0:
+            msg += (
+                'TTS is taken from an online source. '
+                'It may not always be fully responsive. '
+                'Please check your network connection, or retry later.'
+            )
+        showInfo(msg)
+
+    def prepare(notes):
+        # Download the chunk's audio concurrently. fill then only uses what
+        # was downloaded, so texts the scheduler gave up on count as failed
+        # rather than being requested again.
+        texts = set()
+        for note in notes:
+            copy = dict(note)
+            if (
+                has_any_field(copy, fields)
+                and has_any_field(copy, config['fields']['hanzi'])
+                and all_fields_empty(copy, fields)
+            ):
+                hanzi = get_first(config['fields']['hanzi'], copy)
+                texts.add(speech_text(hanzi))
+        texts.discard('')
+        if texts and config['speech']:
+            with DownloadScheduler(config['speech']) as scheduler:
+                filenames.update(scheduler.download_all(texts))
+
+    # Forget audio deleted from the media folder, so it gets downloaded again
+    get_audio_index().prune()
+    run_fill(
+        note_ids,
+        fill,
+        'Bulk Fill Sound',
+        done,
+        label=label,
+        prepare=prepare,
+        chunk_size=50,
+    )
 
 
 def bulk_fill_transcript():
@@ -199,46 +343,46 @@ def bulk_fill_transcript():
     n_updated = 0
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, nid in enumerate(note_ids):
-        note = mw.col.get_note(nid)
-        copy = dict(note)
+    def fill(i, copy):
+        nonlocal d_has_fields, d_added_pinyin
 
         if has_any_field(copy, fields) and has_any_field(
-            config['fields']['hanzi'], copy
+            copy, config['fields']['hanzi']
         ):
             d_has_fields += 1
 
-            msg = '''
-            <b>Processing:</b> %(hanzi)s<br>
-            <b>Filled pinyin:</b> %(pinyin)d notes<br>
-            <b>Updated: </b>%(updated)d fields''' % {
-                'hanzi': get_hanzi(copy),
-                'pinyin': d_added_pinyin,
-                'updated': n_updated,
-            }
-            mw.progress.update(label=msg, value=i)
-
             hanzi = get_first(config['fields']['hanzi'], copy)
-            results = fill_transcript(hanzi, copy)
+            ctx = FillContext(hanzi)
+            results = fill_transcript(hanzi, copy, ctx)
 
             if results > 0:
                 d_added_pinyin += 1
 
-            fill_all_rubies(hanzi, copy)
-            save_note(note, copy)
+            fill_all_rubies(hanzi, copy, ctx)
 
-    mw.progress.finish()
-    msg = '''
-    <b>Processed:</b> %(hanzi)s<br>
+    def label(i, copy):
+        return '''
+            <b>Processing:</b> %(hanzi)s<br>
+            <b>Filled pinyin:</b> %(pinyin)d notes<br>
+            <b>Updated: </b>%(updated)d fields''' % {
+            'hanzi': get_hanzi(copy),
+            'pinyin': d_added_pinyin,
+            'updated': n_updated,
+        }
+
+    def done(n_notes):
+        msg = '''
+    <b>Processed:</b> %(processed)d notes<br>
     <b>Filled pinyin:</b> %(pinyin)d notes<br>
     <b>Updated: </b>%(updated)d fields''' % {
-        'hanzi': get_hanzi(copy),
-        'pinyin': d_added_pinyin,
-        'updated': n_updated,
-    }
-    showInfo(msg)
+            'processed': d_has_fields,
+            'pinyin': d_added_pinyin,
+            'updated': n_updated,
+        }
+        showInfo(msg)
+
+    run_fill(note_ids, fill, 'Bulk Fill Transcription', done, label=label)
 
 
 def bulk_fill_defs():
@@ -264,11 +408,9 @@ def bulk_fill_defs():
     failed_hanzi = []
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, note_id in enumerate(note_ids):
-        note = mw.col.get_note(note_id)
-        copy = dict(note)
+    def fill(i, copy):
+        nonlocal n_processed, n_updated, n_failed, n_notfilled
         hanzi = get_hanzi(copy)
 
         if has_any_field(copy, fields) and hanzi:
@@ -283,38 +425,45 @@ def bulk_fill_defs():
                         n_notfilled += 1
             except:
                 n_failed += 1
-                failed_hanzi += [hanzi]
-
-            msg = progress_msg_template % {
-                'hanzi': hanzi,
-                'has_fields': n_processed,
-                'filled': n_updated,
-                'failed': n_failed,
-            }
-            mw.progress.update(label=msg, value=i)
+                failed_hanzi.append(hanzi)
 
-            save_note(note, copy)
+    def label(i, copy):
+        return progress_msg_template % {
+            'hanzi': get_hanzi(copy),
+            'has_fields': n_processed,
+            'filled': n_updated,
+            'failed': n_failed,
+        }
 
-    msg = '''
+    def done(n_notes):
+        msg = '''
     <b>Translation complete</b><br>
     <b>Chinese notes:</b> %(has_fields)d<br>
     <b>Translated:</b> %(filled)d<br>
     <b>Failed:</b> %(failed)d''' % {
-        'has_fields': n_processed,
-        'filled': n_updated,
-        'failed': n_failed,
-    }
-    if n_failed > 0:
-        failed_msg = (
-            'Translation failures may come either from connection issues '
-            "(if you're using an online translation service), or because some "
-            'words are not it the dictionary (for local dictionaries).\n'
-            'The following notes failed: \n\n'
-            + ', '.join(failed_hanzi)
-        )
-        showText(failed_msg, copyBtn=True)
-    mw.progress.finish()
-    showInfo(msg)
+            'has_fields': n_processed,
+            'filled': n_updated,
+            'failed': n_failed,
+        }
+        if n_failed > 0:
+            failed_msg = (
+                'Translation failures may come either from connection issues '
+                "(if you're using an online translation service), or because some "
+                'words are not it the dictionary (for local dictionaries).\n'
+                'The following notes failed: \n\n'
+                + ', '.join(failed_hanzi)
+            )
+            showText(failed_msg, copyBtn=True)
+        showInfo(msg)
+
+    run_fill(
+        note_ids,
+        fill,
+        'Bulk Fill Definitions',
+        done,
+        label=label,
+        prefetch=True,
+    )
 
 
 def bulk_fill_classifiers():
@@ -332,11 +481,9 @@ def bulk_fill_classifiers():
     n_failed = 0
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, nid in enumerate(note_ids):
-        note = mw.col.get_note(nid)
-        copy = dict(note)
+    def fill(i, copy):
+        nonlocal n_processed, n_updated, n_failed
         hanzi = get_hanzi(copy)
 
         if has_any_field(copy, fields) and hanzi:
@@ -348,20 +495,27 @@ def bulk_fill_classifiers():
                 else:
                     n_failed += 1
 
-            msg = PROGRESS_TEMPLATE % {
-                'hanzi': hanzi,
-                'n_processed': n_processed,
-                'n_updated': n_updated,
-                'n_failed': n_failed,
-            }
-            mw.progress.update(label=msg, value=i)
+    def label(i, copy):
+        return PROGRESS_TEMPLATE % {
+            'hanzi': get_hanzi(copy),
+            'n_processed': n_processed,
+            'n_updated': n_updated,
+            'n_failed': n_failed,
+        }
 
-            save_note(note, copy)
+    def done(n_notes):
+        showInfo(
+            END_TEMPLATE
+            % {'has_fields': n_processed, 'filled': n_updated, 'failed': n_failed}
+        )
 
-    mw.progress.finish()
-    showInfo(
-        END_TEMPLATE
-        % {'has_fields': n_processed, 'filled': n_updated, 'failed': n_failed}
+    run_fill(
+        note_ids,
+        fill,
+        'Bulk Fill Classifiers',
+        done,
+        label=label,
+        prefetch=True,
     )
 
 
@@ -374,40 +528,38 @@ def bulk_fill_hanzi():
         return
 
     d_has_fields = 0
-    n_updated = 0
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, nid in enumerate(note_ids):
-        note = mw.col.get_note(nid)
-        copy = dict(note)
+    def fill(i, copy):
+        nonlocal d_has_fields
         # fixme, should the line below be updated?
-        if has_any_field(copy, fields) and has_any_field(config['fields']['hanzi'], copy):
+        if has_any_field(copy, fields) and has_any_field(copy, config['fields']['hanzi']):
             d_has_fields += 1
 
-            msg = '''
-            <b>Processing:</b> %(hanzi)s<br>
-            <b>Updated:</b> %(filled)d''' % {
-                'hanzi': get_hanzi(copy),
-                'filled': n_updated,
-            }
-            mw.progress.update(label=msg, value=i)
-
             hanzi = get_first(config['fields']['hanzi'], copy)
-            fill_simp(hanzi, copy)
-            fill_trad(hanzi, copy)
-            fill_color(hanzi, copy)
-            n_updated = save_note(note, copy)
+            ctx = FillContext(hanzi)
+            fill_simp(hanzi, copy, ctx)
+            fill_trad(hanzi, copy, ctx)
+            fill_color(hanzi, copy, ctx)
+
+    def label(i, copy):
+        return '''
+            <b>Processing:</b> %(hanzi)s<br>
+            <b>Processed:</b> %(processed)d''' % {
+            'hanzi': get_hanzi(copy),
+            'processed': d_has_fields,
+        }
 
-    msg = '''
-    <b>Update complete!</b> %(hanzi)s<br>
+    def done(n_updated):
+        msg = '''
+    <b>Update complete!</b><br>
     <b>Updated:</b> %(filled)d notes''' % {
-        'hanzi': get_hanzi(copy),
-        'filled': n_updated,
-    }
-    mw.progress.finish()
-    showInfo(msg)
+            'filled': n_updated,
+        }
+        showInfo(msg)
+
+    run_fill(note_ids, fill, 'Bulk Fill Hanzi', done, label=label)
 
 
 def bulk_fill_silhouette():
@@ -419,35 +571,33 @@ def bulk_fill_silhouette():
         return
 
     d_has_fields = 0
-    n_updated = 0
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, nid in enumerate(note_ids):
-        note = mw.col.get_note(nid)
-        copy = dict(note)
-        if has_any_field(config['fields']['silhouette'], copy):
+    def fill(i, copy):
+        nonlocal d_has_fields
+        if has_any_field(copy, config['fields']['silhouette']):
             d_has_fields += 1
-            msg = '''
-            <b>Processing:</b> %(hanzi)s<br>
-            <b>Updated:</b> %(filled)d''' % {
-                'hanzi': get_hanzi(copy),
-                'filled': n_updated,
-            }
-            mw.progress.update(label=msg, value=i)
             hanzi = get_first(config['fields']['hanzi'], copy)
             fill_silhouette(hanzi, copy)
-            n_updated = save_note(note, copy)
 
-    msg = '''
-    <b>Update complete!</b> %(hanzi)s<br>
+    def label(i, copy):
+        return '''
+            <b>Processing:</b> %(hanzi)s<br>
+            <b>Processed:</b> %(processed)d''' % {
+            'hanzi': get_hanzi(copy),
+            'processed': d_has_fields,
+        }
+
+    def done(n_updated):
+        msg = '''
+    <b>Update complete!</b><br>
     <b>Updated:</b> %(filled)d notes''' % {
-        'hanzi': get_hanzi(copy),
-        'filled': n_updated,
-    }
-    mw.progress.finish()
-    showInfo(msg)
+            'filled': n_updated,
+        }
+        showInfo(msg)
+
+    run_fill(note_ids, fill, 'Bulk Fill Silhouette', done, label=label)
 
 
 def bulk_fill_usage():
@@ -474,11 +624,9 @@ def bulk_fill_usage():
     failed_hanzi = []
 
     note_ids = mw.col.find_notes('deck:current')
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, note_id in enumerate(note_ids):
-        note = mw.col.get_note(note_id)
-        copy = dict(note)
+    def fill(i, copy):
+        nonlocal n_processed, n_updated, n_failed, n_notfilled
         hanzi = get_hanzi(copy)
 
         if has_any_field(copy, fields) and hanzi:
@@ -495,39 +643,41 @@ def bulk_fill_usage():
                 n_failed += 1
                 failed_hanzi.append(hanzi)
 
-            msg = progress_msg_template % {
-                'hanzi': hanzi,
-                'has_fields': n_processed,
-                'filled': n_updated,
-                'not_filled': n_notfilled,
-                'failed': n_failed,
-            }
-            mw.progress.update(label=msg, value=i)
-
-            save_note(note, copy)
+    def label(i, copy):
+        return progress_msg_template % {
+            'hanzi': get_hanzi(copy),
+            'has_fields': n_processed,
+            'filled': n_updated,
+            'not_filled': n_notfilled,
+            'failed': n_failed,
+        }
 
-    msg = '''
+    def done(n_notes):
+        msg = '''
     <b>Usage Additions Complete</b><br>
     <b>Chinese Notes:</b> %(has_fields)d<br>
     <b>Usage Fields Filled:</b> %(filled)d<br>
     <b>Usage Fields Not Filled:</b> %(not_filled)d<br>
     <b>Failed:</b> %(failed)d''' % {
-        'has_fields': n_processed,
-        'filled': n_updated,
-        'not_filled': n_notfilled,
-        'failed': n_failed,
-    }
-    if n_failed > 0:
-        failed_msg = (
-            'Usages may not be available in the database\'s data set. '
-            'Custom data can be added to the english_usage column in the'
-            'chinese.db database.\n'
-            'The following notes failed: \n\n'
-            + ', '.join(failed_hanzi)
-        )
-        showText(failed_msg, copyBtn=True)
-    mw.progress.finish()
-    showInfo(msg)
+            'has_fields': n_processed,
+            'filled': n_updated,
+            'not_filled': n_notfilled,
+            'failed': n_failed,
+        }
+        if n_failed > 0:
+            failed_msg = (
+                'Usages may not be available in the database\'s data set. '
+                'Custom data can be added to the english_usage column in the'
+                'chinese.db database.\n'
+                'The following notes failed: \n\n'
+                + ', '.join(failed_hanzi)
+            )
+            showText(failed_msg, copyBtn=True)
+        showInfo(msg)
+
+    run_fill(
+        note_ids, fill, 'Bulk Fill Usage', done, label=label, prefetch=True
+    )
 
 
 def bulk_fill_frequency():
@@ -553,11 +703,9 @@ def bulk_fill_frequency():
     failed_hanzi = []
 
     note_ids = mw.col.find_notes("deck:current")
-    mw.progress.start(immediate=True, min=0, max=len(note_ids))
 
-    for i, note_id in enumerate(note_ids):
-        note = mw.col.get_note(note_id)
-        copy = dict(note)
+    def fill(i, copy):
+        nonlocal n_processed, n_updated, n_failed, n_notfilled
 
         # Ensure note type has hanzi present
         hanzi = None
@@ -578,34 +726,34 @@ def bulk_fill_frequency():
                 n_failed += 1
                 failed_hanzi.append(hanzi)
 
-            msg = progress_msg_template % {
-                "hanzi": hanzi,
-                "has_fields": n_processed,
-                "filled": n_updated,
-                "not_filled": n_notfilled,
-                "failed": n_failed,
-            }
-            mw.progress.update(label=msg, value=i)
-
-            save_note(note, copy)
+    def label(i, copy):
+        return progress_msg_template % {
+            "hanzi": get_hanzi(copy),
+            "has_fields": n_processed,
+            "filled": n_updated,
+            "not_filled": n_notfilled,
+            "failed": n_failed,
+        }
 
-    msg = """
+    def done(n_notes):
+        msg = """
     <b>Frequency Additions Complete</b><br>
     <b>Chinese Notes:</b> %(has_fields)d<br>
     <b>Frequency Fields Filled:</b> %(filled)d<br>
     <b>Frequency Fields Not Filled:</b> %(not_filled)d<br>
     <b>Failed:</b> %(failed)d""" % {
-        "has_fields": n_processed,
-        "filled": n_updated,
-        "not_filled": n_notfilled,
-        "failed": n_failed,
-    }
-    if n_failed > 0:
-        failed_msg = (
-            "Frequency may not be available in the database's data set. "
-            "Custom data can be added to the data/freq/internet-zh file."
-            "The following notes failed: \n\n" + ", ".join(failed_hanzi)
-        )
-        showText(failed_msg, copyBtn=True)
-    mw.progress.finish()
-    showInfo(msg)
+            "has_fields": n_processed,
+            "filled": n_updated,
+            "not_filled": n_notfilled,
+            "failed": n_failed,
+        }
+        if n_failed > 0:
+            failed_msg = (
+                "Frequency may not be available in the database's data set. "
+                "Custom data can be added to the data/freq/internet-zh file."
+                "The following notes failed: \n\n" + ", ".join(failed_hanzi)
+            )
+            showText(failed_msg, copyBtn=True)
+        showInfo(msg)
+
+    run_fill(note_ids, fill, "Bulk Fill Frequency", done, label=label)
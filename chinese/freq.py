@@ -18,49 +18,66 @@
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
 from os.path import dirname, join, realpath
-import re
 
+CORPUS_DIR = join(dirname(realpath(__file__)), 'data', 'freq')
 
-def get_frequency(hanzi):
-    levels = [
-        (200, 'very basic'),
-        (100, 'basic'),
-        (50, 'very common'),
-        (25, 'common'),
-        (13, 'uncommon'),
-        (7, 'rare'),
-        (2, 'very rare'),
-        (0, 'obscure'),
-    ]
+CORPORA = ['internet-zh', 'giga-zh']
 
-    corpus_path = join(
-        dirname(realpath(__file__)), 'data', 'freq', 'internet-zh'
-    )
+LEVELS = [
+    (200, 'very basic'),
+    (100, 'basic'),
+    (50, 'very common'),
+    (25, 'common'),
+    (13, 'uncommon'),
+    (7, 'rare'),
+    (2, 'very rare'),
+    (0, 'obscure'),
+]
 
-    found = False
+_indices = {}
 
-    with open(corpus_path, encoding='utf8') as f:
+
+def load_corpus(corpus='internet-zh'):
+    """Return a word -> frequency index for one of the Leeds corpora.
+
+    The index is built on first use and kept for the lifetime of the add-on.
+    """
+
+    if corpus not in CORPORA:
+        raise NotImplementedError(corpus)
+
+    if corpus in _indices:
+        return _indices[corpus]
+
+    index = {}
+    with open(join(CORPUS_DIR, corpus), encoding='utf8') as f:
         for line in f:
-            try:  # This avoids a crash if trying to autofill an emoji 👌
-                res = re.match('[0-9]+ ([0-9.]+) %s$' % re.escape(hanzi), line)
-            except TypeError:
+            cols = line.split()
+            # Skip the header lines that precede the frequency table
+            if len(cols) != 3 or not cols[0].isdigit():
                 continue
-            if res:
-                freq = float(res.group(1))
-                found = True
-                break
+            # Keep the first (highest-ranked) entry if a word repeats
+            index.setdefault(cols[2], float(cols[1]))
+
+    _indices[corpus] = index
+    return index
+
+
+def get_frequency(hanzi, corpus='internet-zh'):
+    freq = load_corpus(corpus).get(hanzi)
+
+    if freq is None:
+        return '<div class="freq freq-unknown">unknown</div>'
 
-    html = '<div class="freq freq-unknown">unknown</div>'
+    return frequency_html(freq)
 
-    if not found:
-        return html
 
-    for level, desc in levels:
+def frequency_html(freq):
+    for level, desc in LEVELS:
         if freq > level:
-            html = '<div class="freq freq-%s">%s</div>' % (
+            return '<div class="freq freq-%s">%s</div>' % (
                 desc.replace(' ', '-'),
                 desc,
             )
-            break
 
-    return html
+    return '<div class="freq freq-unknown">unknown</div>'
@@ -24,17 +24,6 @@ from aqt.utils import openLink
 from aqt.qt import QAction, QActionGroup, QMenu, QKeySequence
 
 from .about import CSR_GITHUB_URL, showAbout
-from .fill import (
-    bulk_fill_all,
-    bulk_fill_classifiers,
-    bulk_fill_defs,
-    bulk_fill_frequency,
-    bulk_fill_hanzi,
-    bulk_fill_silhouette,
-    bulk_fill_sound,
-    bulk_fill_transcript,
-    bulk_fill_usage,
-)
 from .main import config
 
 
@@ -46,6 +35,18 @@ SPEECH_ENGINES = {
     'Disabled': None,
 }
 
+BULK_FILLS = {
+    'Hanzi': 'bulk_fill_hanzi',
+    'Definitions': 'bulk_fill_defs',
+    'Transcripts': 'bulk_fill_transcript',
+    'Classifiers': 'bulk_fill_classifiers',
+    'Sound': 'bulk_fill_sound',
+    'Silhouette': 'bulk_fill_silhouette',
+    'Frequency': 'bulk_fill_frequency',
+    'Usage': 'bulk_fill_usage',
+    'All': 'bulk_fill_all',
+}
+
 PHONETIC_TARGETS = {
     'Pinyin': 'pinyin',
     'Pinyin (Taiwan)': 'pinyin_tw',
@@ -74,15 +75,8 @@ def load_menu():
         )
 
     add_menu('Chinese::Bulk Fill')
-    add_menu_item('Chinese::Bulk Fill', ('Hanzi'), bulk_fill_hanzi)
-    add_menu_item('Chinese::Bulk Fill', ('Definitions'), bulk_fill_defs)
-    add_menu_item('Chinese::Bulk Fill', ('Transcripts'), bulk_fill_transcript)
-    add_menu_item('Chinese::Bulk Fill', ('Classifiers'), bulk_fill_classifiers)
-    add_menu_item('Chinese::Bulk Fill', ('Sound'), bulk_fill_sound)
-    add_menu_item('Chinese::Bulk Fill', ('Silhouette'), bulk_fill_silhouette)
-    add_menu_item('Chinese::Bulk Fill', ('Frequency'), bulk_fill_frequency)
-    add_menu_item('Chinese::Bulk Fill', ('Usage'), bulk_fill_usage)
-    add_menu_item('Chinese::Bulk Fill', ('All'), bulk_fill_all)
+    for text, name in BULK_FILLS.items():
+        add_menu_item('Chinese::Bulk Fill', text, bulk_fill(name))
 
     add_menu('Chinese::Help')
     add_menu_item(
@@ -93,6 +87,18 @@ def load_menu():
     add_menu_item('Chinese::Help', ('About...'), showAbout)
 
 
+def bulk_fill(name):
+    """Return a menu action running one of the bulk fills, which are only
+    imported when first used."""
+
+    def run():
+        from . import fill
+
+        getattr(fill, name)()
+
+    return run
+
+
 def unload_menu():
     for menu in mw.custom_menus.values():
         mw.form.menubar.removeAction(menu.menuAction())
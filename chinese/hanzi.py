@@ -16,13 +16,81 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
+import marshal
+from mmap import ACCESS_READ, mmap
+from os import makedirs, remove, replace, scandir
+from os.path import dirname, getmtime, join, realpath
 from re import search, split, sub
-
-from jieba import cut
+from tempfile import mkstemp
 
 from .consts import HANZI_RANGE
 from .main import config, dictionary
-from .util import cleanup, get_first
+from .util import USER_FILES, cleanup, get_first
+
+
+def segmenter_cache():
+    """Return the path of the jieba prefix dictionary cache.
+
+    It is named after the dictionary's modification time, so an add-on
+    update that ships a new dictionary gets a new cache.
+    """
+
+    import jieba
+
+    dict_path = join(dirname(realpath(jieba.__file__)), 'dict.txt')
+    return join(USER_FILES, 'jieba.%d.cache' % getmtime(dict_path))
+
+
+def load_segmenter():
+    """Return the jieba tokenizer, importing and initializing it on first use.
+
+    Importing jieba alone takes about half a second, so it is left until
+    text is first segmented, or until the background warm-up.
+
+    jieba keeps its cache in the temp dir, which is shared between users and
+    often cleared on reboot, so the first segmentation of a session usually
+    rebuilds it. The cache here is memory-mapped and unmarshalled in one
+    call, which is several times faster than jieba's own marshal.load.
+    """
+
+    import jieba
+
+    tokenizer = jieba.dt
+    if tokenizer.initialized:
+        return tokenizer
+
+    with tokenizer.lock:
+        if tokenizer.initialized:
+            return tokenizer
+
+        path = segmenter_cache()
+        try:
+            with open(path, 'rb') as f:
+                with mmap(f.fileno(), 0, access=ACCESS_READ) as m:
+                    tokenizer.FREQ, tokenizer.total = marshal.loads(m)
+        except (OSError, ValueError, EOFError, TypeError):
+            tokenizer.FREQ, tokenizer.total = tokenizer.gen_pfdict(
+                tokenizer.get_dict_file()
+            )
+            save_segmenter_cache(path, (tokenizer.FREQ, tokenizer.total))
+
+        tokenizer.initialized = True
+        return tokenizer
+
+
+def save_segmenter_cache(path, data):
+    try:
+        makedirs(USER_FILES, exist_ok=True)
+        fd, tmp_path = mkstemp(dir=USER_FILES)
+        with open(fd, 'wb') as f:
+            marshal.dump(data, f)
+        replace(tmp_path, path)
+        for e in scandir(USER_FILES):
+            if e.name.startswith('jieba.') and e.path != path:
+                remove(e.path)
+    except OSError:
+        # The dictionary is loaded either way; it is only rebuilt next time
+        pass
 
 
 def get_silhouette(hanzi):
@@ -58,7 +126,7 @@ def split_hanzi(hanzi, grouped=True):
     if len(hanzi.split()) > 1:
         separated = remove_empty(split('([ ,.，。])', hanzi))
     else:
-        separated = list(cut(hanzi))
+        separated = list(load_segmenter().cut(hanzi))
 
     if grouped:
         return separated
@@ -16,7 +16,7 @@
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
 from anki.hooks import wrap
-from aqt import gui_hooks
+from aqt import gui_hooks, mw
 from anki.stats import CollectionStats
 from anki.stdmodels import models
 
@@ -33,19 +33,16 @@ from .models import advanced, basic
 from .templates import chinese, ruby
 
 
-if config['firstRun']:
-    dictionary.create_indices()
-    config['firstRun'] = False
-
-
 def load():
     ruby.install()
     chinese.install()
     gui_hooks.profile_did_open.append(load_menu)
     gui_hooks.profile_did_open.append(add_models)
-    gui_hooks.profile_did_open.append(dictionary.connect)
+    gui_hooks.profile_did_open.append(setup_dictionary)
+    gui_hooks.profile_did_open.append(warm_up)
     gui_hooks.profile_will_close.append(config.save)
     gui_hooks.profile_will_close.append(dictionary.close)
+    gui_hooks.profile_will_close.append(close_audio)
     gui_hooks.profile_will_close.append(unload_menu)
     CollectionStats.todayStats = wrap(
         CollectionStats.todayStats, todayStats, 'around'
@@ -53,6 +50,35 @@ def load():
     EditManager()
 
 
+def setup_dictionary():
+    cache_size = config.get_config_scalar_value('lookup_cache_size')
+    if cache_size is not None:
+        dictionary.cache.maxsize = cache_size
+
+    if config['firstRun']:
+        dictionary.create_indices()
+        config['firstRun'] = False
+
+
+def warm_up():
+    """Load the segmenter and the word index in the background, so that the
+    first edit of the session doesn't wait for them."""
+
+    from .hanzi import load_segmenter
+
+    def task():
+        load_segmenter()
+        dictionary._word_index()
+
+    mw.taskman.run_in_background(task)
+
+
+def close_audio():
+    from .tts import close_audio_indices
+
+    close_audio_indices()
+
+
 def add_models():
     models.append(('Chinese (Advanced)', advanced.add_model))
     models.append(('Chinese (Basic)', basic.add_model))
@@ -0,0 +1,156 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+"""Precompiled patterns for the transcription hot paths.
+
+The regular expressions in consts are large alternations. Building them
+into f-strings on every call defeats the re module's small internal cache,
+so they are compiled once here. Checking whether a string is a whole
+syllable is done with set lookups rather than a regex.
+"""
+
+from itertools import product
+from re import IGNORECASE, compile, findall
+
+from .consts import (
+    BOPOMOFO_REGEX,
+    CMN_TONE_NUMBERS,
+    HALF_RUBY_REGEX,
+    HANZI_REGEX,
+    JYUTPING_FINALS,
+    JYUTPING_INITIALS,
+    JYUTPING_REGEX,
+    JYUTPING_STANDALONES,
+    NOT_PINYIN_REGEX,
+    PINYIN_FINALS,
+    PINYIN_INITIALS,
+    PINYIN_REGEX,
+    RUBY_REGEX,
+    TONE_NUM_REGEX,
+    TONE_NUMBERS,
+    YUE_TONE_NUMBERS,
+)
+
+AEO = compile('([aeo])')
+ANY_CASE_VOWEL = compile('[aeiouüv]', IGNORECASE)
+BOPOMOFO = compile(BOPOMOFO_REGEX)
+BOPOMOFO_SYLLABLE = compile(f'^{BOPOMOFO_REGEX}$')
+BOPOMOFO_TONE_END = compile(r'[ˊˇˋ˙]$')
+CMN_TONE_DIGIT = compile('[12345]')
+HALF_RUBY = compile(HALF_RUBY_REGEX)
+IU_UI = compile('(iu|ui)')
+JYUTPING_SYLLABLE = compile(f'^{JYUTPING_REGEX}$')
+NOT_PINYIN = compile(NOT_PINYIN_REGEX)
+PINYIN_SYLLABLE = compile(f'^{PINYIN_REGEX}$')
+RUBY = compile(r'%s\[.+\]' % HANZI_REGEX)
+RUBY_SYLLABLE = compile(RUBY_REGEX)
+RUBY_TRANSCRIPT = compile(r'(%s\[)([^[]+?)\]' % HANZI_REGEX)
+SUPERSCRIPT_TONE_END = compile('[¹²³⁴]$')
+TONE_NUM = compile(TONE_NUM_REGEX)
+TONE_NUM_END = compile(f'[{TONE_NUMBERS}]$')
+TONED_SYLLABLE = compile(r'([a-zü]+)%s' % TONE_NUM_REGEX)
+VOWEL = compile('([aeiouüv])')
+
+
+def _class_chars(char_class):
+    """Return the characters of a character class body such as 1-5¹²."""
+
+    chars = ''
+    for first, last in findall(r'(.)(?:-(.))?', char_class):
+        if last:
+            chars += ''.join(map(chr, range(ord(first), ord(last) + 1)))
+        else:
+            chars += first
+    return chars
+
+
+def _expand(alternation):
+    """Return every string matched by an alternation such as those in
+    consts, which are made up of literals and character classes only."""
+
+    strings = set()
+    for branch in alternation.split('|'):
+        parts = [
+            literal or _class_chars(char_class)
+            for literal, char_class in findall(r'([^[])|\[([^]]*)\]', branch)
+        ]
+        strings.update(map(''.join, product(*parts)))
+    return frozenset(strings)
+
+
+class Syllables:
+    """Set of the syllables matched by TRANSCRIPT_REGEX_TEMPLATE, i.e. an
+    initial and a final, or a standalone final, either followed by an
+    optional tone number.
+
+    As in the template, a leading apostrophe is only accepted before the
+    first alternative of the standalones.
+    """
+
+    def __init__(self, initials, finals, standalones, tones):
+        self.initials = _expand(initials)
+        self.finals = _expand(finals)
+        self.standalones = _expand(standalones)
+        self.quoted = _expand(standalones.split('|', 1)[0])
+        self.tones = frozenset(_class_chars(tones))
+        self.longest_initial = max(map(len, self.initials))
+        self.longest = 1 + max(
+            self.longest_initial + max(map(len, self.finals)),
+            1 + max(map(len, self.standalones)),
+        )
+
+    def __contains__(self, s):
+        s = s.lower()
+        if s[-1:] in self.tones:
+            s = s[:-1]
+        if s.startswith("'"):
+            return s[1:] in self.quoted
+        if s in self.standalones:
+            return True
+        return any(
+            s[:i] in self.initials and s[i:] in self.finals
+            for i in range(1, min(len(s), self.longest_initial) + 1)
+        )
+
+    def split(self, s):
+        """Split s into syllables, taking the longest one at each position.
+
+        Anything left over when no syllable matches is kept as is. Since no
+        syllable is longer than self.longest, this takes linear time.
+        """
+
+        syllables = []
+        start = 0
+        while start < len(s):
+            for end in range(min(len(s), start + self.longest), start, -1):
+                if s[start:end] in self:
+                    syllables.append(s[start:end])
+                    start = end
+                    break
+            else:
+                syllables.append(s[start:])
+                break
+        return syllables
+
+
+PINYIN_SYLLABLES = Syllables(
+    PINYIN_INITIALS, PINYIN_FINALS, PINYIN_FINALS, CMN_TONE_NUMBERS
+)
+
+JYUTPING_SYLLABLES = Syllables(
+    JYUTPING_INITIALS, JYUTPING_FINALS, JYUTPING_STANDALONES, YUE_TONE_NUMBERS
+)
@@ -16,12 +16,13 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
-from re import search, sub
+from re import sub
 
 from .bopomofo import bopomofo
 from .consts import HANZI_REGEX
 from .hanzi import has_hanzi
 from .main import dictionary
+from .patterns import RUBY
 from .util import hide, no_color
 
 
@@ -69,7 +70,7 @@ def ruby(words, target):
 
 
 def has_ruby(text):
-    return search(r'%s\[.+\]' % HANZI_REGEX, text)
+    return RUBY.search(text)
 
 
 def hide_ruby(text):
@@ -24,11 +24,27 @@ from .main import config
 from .tts import AudioDownloader
 
 
-def sound(hanzi, source=None):
-    """Returns sound tag for a given Hanzi string."""
+def speech_text(hanzi):
+    """Returns the part of a Hanzi string to be spoken, if any."""
 
     from .ruby import ruby_bottom, has_ruby
 
+    if not has_hanzi(hanzi):
+        return ''
+
+    if has_ruby(hanzi):
+        hanzi = ruby_bottom(hanzi)
+
+    return hanzi
+
+
+def sound(hanzi, source=None, filenames=None):
+    """Returns sound tag for a given Hanzi string.
+
+    If filenames, a {text: filename} dict of audio downloaded beforehand, is
+    given, the audio is taken from it rather than downloaded.
+    """
+
     if not has_hanzi(hanzi):
         return ''
 
@@ -41,12 +57,16 @@ def sound(hanzi, source=None):
     if source.count('|') != 1:
         raise ValueError(source)
 
-    if has_ruby(hanzi):
-        hanzi = ruby_bottom(hanzi)
+    hanzi = speech_text(hanzi)
 
     if not hanzi:
         return ''
 
+    if filenames is not None:
+        if hanzi in filenames:
+            return '[sound:%s]' % filenames[hanzi]
+        return ''
+
     if source:
         return '[sound:%s]' % AudioDownloader(hanzi, source).download()
 
@@ -16,24 +16,29 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
-from re import findall, IGNORECASE, search, split, sub
-from unicodedata import lookup, name, normalize
+from unicodedata import normalize
 
 from .bopomofo import bopomofo
-from .consts import (
-    BOPOMOFO_REGEX,
-    CHINESE_PUNC_TO_LATIN,
-    DIACRITIC_NAME_TO_NUM,
-    HANZI_REGEX,
-    JYUTPING_REGEX,
-    NOT_PINYIN_REGEX,
-    PINYIN_REGEX,
-    PINYIN_VOWELS,
-    TONE_NUMBERS,
-    TONE_NUM_REGEX,
-)
+from .consts import CHINESE_PUNC_TO_LATIN, DIACRITIC_TO_NUM, NUM_TO_DIACRITIC
 from .hanzi import has_hanzi
 from .main import dictionary
+from .patterns import (
+    AEO,
+    ANY_CASE_VOWEL,
+    BOPOMOFO,
+    BOPOMOFO_TONE_END,
+    CMN_TONE_DIGIT,
+    IU_UI,
+    JYUTPING_SYLLABLES,
+    NOT_PINYIN,
+    PINYIN_SYLLABLES,
+    RUBY_TRANSCRIPT,
+    SUPERSCRIPT_TONE_END,
+    TONE_NUM,
+    TONE_NUM_END,
+    TONED_SYLLABLE,
+    VOWEL,
+)
 from .ruby import has_ruby, ruby_bottom, ruby_top, separate_ruby
 from .util import cleanup, is_punc, no_color
 
@@ -105,46 +110,85 @@ def transcribe_char(hanzi, target, type_):
     raise NotImplementedError(target)
 
 
+_tone_tables = None
+
+
+def tone_tables():
+    """Return tables converting the pinyin syllable inventory between
+    tone numbers and tone marks, and giving the tone of either form.
+
+    They hold what accentuate, get_tone_number_pinyin and tone_number
+    would compute for these syllables, and are built on first use.
+    """
+
+    global _tone_tables
+
+    if _tone_tables is None:
+        letters = set('abcdefghijklmnopqrstuvwxyzü')
+        toneless = {
+            s
+            for s in PINYIN_SYLLABLES.standalones.union(
+                i + f
+                for i in PINYIN_SYLLABLES.initials
+                for f in PINYIN_SYLLABLES.finals
+            )
+            if letters.issuperset(s)
+        }
+        accented, numbered, tones = {}, {}, {}
+        for syllable in toneless:
+            for tone in '12345':
+                marked = normalize('NFC', _add_tone_mark(syllable, tone))
+                accented[syllable + tone] = marked
+                numbered[marked] = _get_tone_number_pinyin(marked)
+                tones[syllable + tone] = tone
+        for marked, s in numbered.items():
+            if marked in PINYIN_SYLLABLES:
+                tones[marked] = s[-1]
+        _tone_tables = accented, numbered, tones
+
+    return _tone_tables
+
+
+def _add_tone_mark(word, tone):
+    if tone == '5':
+        return word
+
+    diacritic = NUM_TO_DIACRITIC[tone]
+
+    n_vowels = len(ANY_CASE_VOWEL.findall(word))
+    if n_vowels == 1:
+        return VOWEL.sub(f'\\1{diacritic}', word)
+    if 'ao' in word:
+        return word.replace('ao', f'a{diacritic}o')
+    if IU_UI.search(word):
+        return IU_UI.sub(f'\\1{diacritic}', word)
+    if AEO.search(word):
+        return AEO.sub(f'\\1{diacritic}', word)
+    return word
+
+
+def _accentuate(word):
+    if not CMN_TONE_DIGIT.search(word):
+        return word
+
+    word = no_color(word)
+    return _add_tone_mark(word[:-1], tone_number(word))
+
+
 def accentuate(text, target):
     assert isinstance(text, list)
 
     if target not in ['pinyin', 'pinyin_tw']:
         return text
 
+    accented, _, _ = tone_tables()
     accentuated = []
 
-    def _accentuate(word):
-        if not search('[12345]', word):
-            return word
-
-        word = no_color(word)
-        tone = tone_number(word)
-        word = word[:-1]
-
-        if tone == '5':
-            return word
-
-        for k, v in DIACRITIC_NAME_TO_NUM.items():
-            if v == tone:
-                diacritic = lookup(k)
-                break
-
-        vowel = '([aeiouüv])'
-        n_vowels = len(findall(vowel, word, IGNORECASE))
-        if n_vowels == 1:
-            s = sub(vowel, f'\\1{diacritic}', word)
-        elif search('ao', word):
-            s = sub('ao', f'a{diacritic}o', word)
-        elif search('(iu|ui)', word):
-            s = sub('(iu|ui)', f'\\1{diacritic}', word)
-        elif search('[aeo]', word):
-            s = sub('([aeo])', f'\\1{diacritic}', word)
-        else:
-            s = word
-        return s
-
     for word in text:
-        s = ' '.join(_accentuate(w) for w in word.split())
+        s = ' '.join(
+            accented[w] if w in accented else _accentuate(w)
+            for w in word.split()
+        )
         accentuated.append(normalize('NFC', s))
 
     return accentuated
@@ -171,9 +215,17 @@ def replace_tone_marks(pinyin: list) -> list:
 def get_tone_number_pinyin(syllable):
     assert isinstance(syllable, str)
 
+    _, numbered, _ = tone_tables()
+    if syllable in numbered:
+        return numbered[syllable]
+
+    return _get_tone_number_pinyin(syllable)
+
+
+def _get_tone_number_pinyin(syllable):
     if (
-        search(TONE_NUM_REGEX, syllable)
-        or search(BOPOMOFO_REGEX, syllable)
+        TONE_NUM.search(syllable)
+        or BOPOMOFO.search(syllable)
         or is_punc(syllable)
     ):
         return syllable
@@ -186,8 +238,8 @@ def get_tone_number_pinyin(syllable):
 
     tone = '5'
     for c in normalize('NFD', syllable):
-        if name(c) in DIACRITIC_NAME_TO_NUM:
-            tone = DIACRITIC_NAME_TO_NUM[name(c)]
+        if c in DIACRITIC_TO_NUM:
+            tone = DIACRITIC_TO_NUM[c]
         else:
             s += c
 
@@ -203,36 +255,18 @@ def split_transcript(transcript, target, grouped=True):
     if target not in ['pinyin', 'pinyin_tw', 'jyutping']:
         raise NotImplementedError(target)
 
-    def _split(pattern, s):
-        if search(f'^{pattern}$', s, IGNORECASE):
+    def _split(syllables, s):
+        if s in syllables:
             return s
-
-        remainder = s.replace("'", '')
-        done = []
-        while True:
-            found = False
-            for i in range(len(remainder), 0, -1):
-                if search(f'^{pattern}$', remainder[:i], IGNORECASE):
-                    done.append(remainder[:i])
-                    remainder = remainder[i:]
-                    found = True
-                    break
-            if found and remainder:
-                continue
-            elif remainder:
-                done.append(remainder)
-                break
-            else:
-                break
-        return ' '.join(done)
+        return ' '.join(syllables.split(s.replace("'", '')))
 
     separated = []
 
-    for text in split(NOT_PINYIN_REGEX, transcript):
+    for text in NOT_PINYIN.split(transcript):
         if target in ['pinyin', 'pinyin_tw']:
-            text = _split(PINYIN_REGEX, text)
+            text = _split(PINYIN_SYLLABLES, text)
         elif target == 'jyutping':
-            text = _split(JYUTPING_REGEX, text)
+            text = _split(JYUTPING_SYLLABLES, text)
 
         if grouped:
             separated.append(text)
@@ -245,16 +279,20 @@ def split_transcript(transcript, target, grouped=True):
 def tone_number(s):
     assert isinstance(s, str)
 
+    _, _, tones = tone_tables()
+    if s in tones:
+        return tones[s]
+
     s, *_ = replace_tone_marks([cleanup(s)])
 
-    if search(f'[¹²³⁴]$', s):
+    if SUPERSCRIPT_TONE_END.search(s):
         return str(' ¹²³⁴'.index(s[-1:]))
 
-    if search(f'[{TONE_NUMBERS}]$', s):
+    if TONE_NUM_END.search(s):
         return s[-1]
 
-    if search(BOPOMOFO_REGEX, s):
-        if search(r'[ˊˇˋ˙]$', s):
+    if BOPOMOFO.search(s):
+        if BOPOMOFO_TONE_END.search(s):
             return str('  ˊˇˋ˙'.index(s[-1]))
         return '1'
 
@@ -268,12 +306,12 @@ def no_tone(text: str):
     text, *_ = replace_tone_marks([text])
 
     def _remove_tone(p):
-        return p.group(1) + sub(TONE_NUM_REGEX, '', p.group(2)) + ']'
+        return p.group(1) + TONE_NUM.sub('', p.group(2)) + ']'
 
     if has_ruby(text):
-        return sub(r'(%s\[)([^[]+?)\]' % HANZI_REGEX, _remove_tone, text)
+        return RUBY_TRANSCRIPT.sub(_remove_tone, text)
 
-    return sub(r'([a-zü]+)%s' % TONE_NUM_REGEX, r'\1', text)
+    return TONED_SYLLABLE.sub(r'\1', text)
 
 
 def sanitize_transcript(transcript, target, grouped=False):
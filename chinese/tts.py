@@ -6,55 +6,253 @@
 # Inspiration: Tymon Warecki
 # License: GNU AGPL, version 3 or later; http://www.gnu.org/copyleft/agpl.html
 
+import sqlite3
 import ssl
-from os.path import basename, exists, join
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha1
+from os import makedirs, remove, scandir, stat
+from os.path import basename, dirname, exists, join
 from re import sub
+from threading import Lock
+from time import monotonic, sleep
+from unicodedata import normalize
 from urllib.parse import urlencode
 from urllib.request import Request, urlopen
 
-import requests
 from aqt import mw
-from gtts import gTTS
-from gtts.tts import gTTSError
 
-from .aws import AWS4Signer
+from .util import USER_FILES
 
-requests.packages.urllib3.disable_warnings()
+# Requests per second and burst size allowed for each TTS service
+RATE_LIMITS = {
+    'google': (2, 4),
+    'baidu': (1, 2),
+    'aws': (10, 10),
+}
+
+GOOGLE_TLD = 'com'
+BAIDU_SPEED = 2
+
+# Settings that change the audio a service returns for the same text
+VOICE_PARAMS = {
+    'google': 'tld=%s' % GOOGLE_TLD,
+    'baidu': 'spd=%d' % BAIDU_SPEED,
+}
+
+# Named after the media folder, as each profile has its own
+AUDIO_INDEX_FILENAME = 'audio.%s.db'
+
+_audio_indices = {}
+_audio_indices_lock = Lock()
+
+
+class AudioIndex:
+    """Record of the audio files downloaded into a media folder.
+
+    Maps a key describing the audio (text, service, language and voice
+    settings) to the file holding it, with its size and SHA-1. Lookups are
+    answered from memory; the index is persisted in SQLite in the add-on's
+    user files, so it survives restarts.
+    """
+
+    def __init__(self, media_dir, path=None):
+        self.media_dir = media_dir
+        self.path = path or join(
+            USER_FILES,
+            AUDIO_INDEX_FILENAME % sha1(media_dir.encode()).hexdigest()[:16],
+        )
+        self.lock = Lock()
+        self.conn = None
+        self.entries = {}
+        if exists(self.path):
+            self.entries = {
+                key: (filename, size)
+                for key, filename, size in self.connect().execute(
+                    'SELECT key, filename, size FROM audio'
+                )
+            }
+        self.owners = {f: key for key, (f, _) in self.entries.items()}
+
+    def connect(self):
+        # The database is only created once there is something to record
+        if not self.conn:
+            makedirs(dirname(self.path), exist_ok=True)
+            self.conn = sqlite3.connect(self.path, check_same_thread=False)
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS audio ('
+                'key TEXT PRIMARY KEY, filename TEXT, size INTEGER, sha1 TEXT)'
+            )
+        return self.conn
+
+    @staticmethod
+    def key(text, service, lang, params=''):
+        return '|'.join([normalize('NFC', text.strip()), service, lang, params])
+
+    def close(self):
+        with self.lock:
+            if self.conn:
+                self.conn.close()
+                self.conn = None
+
+    def get(self, key, verify=False):
+        """Return the file holding key's audio.
+
+        With verify, the file is checked to still be there and not empty, and
+        forgotten otherwise. Bulk runs prune() once instead.
+        """
+
+        entry = self.entries.get(key)
+        if not entry:
+            return None
+        if not verify:
+            return entry[0]
+        try:
+            size = stat(join(self.media_dir, entry[0])).st_size
+        except OSError:
+            size = 0
+        if not size:
+            with self.lock:
+                self.forget([key])
+            return None
+        return entry[0]
+
+    def owner(self, filename):
+        return self.owners.get(filename)
+
+    def add(self, key, filename):
+        """Record filename as holding key's audio, unless it is empty."""
+
+        with open(join(self.media_dir, filename), 'rb') as f:
+            data = f.read()
+        if not data:
+            return False
+        with self.lock:
+            old = self.entries.get(key)
+            if old:
+                self.owners.pop(old[0], None)
+            self.entries[key] = (filename, len(data))
+            self.owners[filename] = key
+            with self.connect() as conn:
+                conn.execute(
+                    'INSERT OR REPLACE INTO audio VALUES (?, ?, ?, ?)',
+                    (key, filename, len(data), sha1(data).hexdigest()),
+                )
+        return True
+
+    def prune(self):
+        """Forget files that were deleted or changed size since indexed.
+
+        Takes a single pass over the media folder.
+        """
+
+        sizes = {
+            e.name: e.stat().st_size for e in scandir(self.media_dir)
+        }
+        with self.lock:
+            stale = [
+                key
+                for key, (filename, size) in self.entries.items()
+                if sizes.get(filename) != size
+            ]
+            self.forget(stale)
+        return len(stale)
+
+    def forget(self, keys):
+        """Drop keys from the index; the caller holds the lock."""
+
+        keys = [key for key in keys if key in self.entries]
+        for key in keys:
+            self.owners.pop(self.entries.pop(key)[0], None)
+        if not keys:
+            return
+        with self.connect() as conn:
+            conn.executemany(
+                'DELETE FROM audio WHERE key = ?', [(k,) for k in keys]
+            )
+
+
+def get_audio_index():
+    """Return the audio index of the current collection's media folder."""
+
+    media_dir = mw.col.media.dir()
+    # Download threads may ask for it at the same time
+    with _audio_indices_lock:
+        if media_dir not in _audio_indices:
+            _audio_indices[media_dir] = AudioIndex(media_dir)
+        return _audio_indices[media_dir]
+
+
+def close_audio_indices():
+    with _audio_indices_lock:
+        while _audio_indices:
+            _audio_indices.popitem()[1].close()
 
 
 class AudioDownloader:
-    def __init__(self, text, source='google|zh-CN'):
+    baidu_url = 'https://fanyi.baidu.com/gettts'
+
+    def __init__(self, text, source='google|zh-CN', index=None, verify=True):
         self.text = text
         self.service, self.lang = source.split('|')
-        self.path = self.get_path()
         self.func = {
             'google': self.get_google,
             'baidu': self.get_baidu,
             'aws': self.get_aws,
         }.get(self.service)
+        if not self.func:
+            raise NotImplementedError(self.service)
+        self.index = index or get_audio_index()
+        self.key = self.index.key(
+            text, self.service, self.lang, VOICE_PARAMS.get(self.service, '')
+        )
+        self.filename = self.index.get(self.key, verify)
+        self.path = self.get_path()
 
     def get_path(self):
-        filename = '{}_{}_{}.mp3'.format(
-            self.sanitize(self.text), self.service, self.lang
-        )
-        return join(mw.col.media.dir(), filename)
+        filename = self.filename
+        if not filename:
+            filename = '{}_{}_{}.mp3'.format(
+                self.sanitize(self.text), self.service, self.lang
+            )
+            owner = self.index.owner(filename)
+            # Different texts may sanitize to the same name
+            if owner and owner != self.key:
+                filename = '{}_{}.mp3'.format(
+                    filename[:-4], sha1(self.key.encode()).hexdigest()[:8]
+                )
+        return join(self.index.media_dir, filename)
 
     def sanitize(self, s):
         return sub(r'[/:*?"<>|]', '', s)
 
-    def download(self):
-        if exists(self.path):
-            return basename(self.path)
+    def cached(self):
+        """Return the file already holding this audio, if any."""
 
-        if not self.func:
-            raise NotImplementedError(self.service)
+        if not self.filename:
+            # Downloaded before the index existed
+            if exists(self.path) and self.index.add(
+                self.key, basename(self.path)
+            ):
+                self.filename = basename(self.path)
+        return self.filename
+
+    def download(self):
+        filename = self.cached()
+        if filename:
+            return filename
 
         self.func()
 
+        if exists(self.path) and self.index.add(self.key, basename(self.path)):
+            self.filename = basename(self.path)
+
         return basename(self.path)
 
     def get_google(self):
-        tts = gTTS(self.text, lang=self.lang, tld='com')
+        from gtts import gTTS
+        from gtts.tts import gTTSError
+
+        tts = gTTS(self.text, lang=self.lang, tld=GOOGLE_TLD)
         try:
             tts.save(self.path)
         except gTTSError as e:
@@ -65,11 +263,11 @@ class AudioDownloader:
             'lan': self.lang,
             'ie': 'UTF-8',
             'text': self.text.encode('utf-8'),
-            'spd': 2,
+            'spd': BAIDU_SPEED,
             'source': 'web',
         }
 
-        url = 'https://fanyi.baidu.com/gettts?' + urlencode(query)
+        url = self.baidu_url + '?' + urlencode(query)
         request = Request(url)
         request.add_header('User-Agent', 'Mozilla/5.0')
 
@@ -88,6 +286,11 @@ class AudioDownloader:
             audio.write(bytes_response)
 
     def get_aws(self):
+        import requests
+
+        from .aws import AWS4Signer
+
+        requests.packages.urllib3.disable_warnings()
         signer = AWS4Signer(service='polly')
         signer.use_aws_profile('chinese_support_redux')
 
@@ -109,3 +312,113 @@ class AudioDownloader:
 
         with open(self.path, 'wb') as audio:
             audio.write(response.content)
+
+
+class TokenBucket:
+    """Rate limiter letting through rate calls per second, in bursts of up
+    to capacity calls."""
+
+    def __init__(self, rate, capacity, clock=monotonic, sleep=sleep):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = Lock()
+
+    def acquire(self):
+        """Take a token, waiting for one to become available if needed."""
+
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            self.sleep(wait)
+
+
+class DownloadScheduler:
+    """Download audio for many texts at once.
+
+    Downloads run on a pool of worker threads, rate limited per service by a
+    token bucket. Failed downloads are retried with exponential backoff, and
+    a text is only ever downloaded once per scheduler. Indexed audio is
+    taken as is, so the index should be pruned before a run.
+    """
+
+    buckets = {}
+
+    def __init__(self, source='google|zh-CN', workers=4, retries=3, backoff=1):
+        self.source = source
+        self.retries = retries
+        self.backoff = backoff
+        self.bucket = self.get_bucket(source.split('|')[0])
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.futures = {}
+        self.lock = Lock()
+
+    @classmethod
+    def get_bucket(cls, service):
+        # Shared by all schedulers, as the limits are the service's
+        if service not in cls.buckets:
+            cls.buckets[service] = TokenBucket(*RATE_LIMITS.get(service, (1, 1)))
+        return cls.buckets[service]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, text):
+        """Schedule text for download, returning a future of its filename."""
+
+        with self.lock:
+            if text not in self.futures:
+                self.futures[text] = self.executor.submit(self.download, text)
+            return self.futures[text]
+
+    def download(self, text):
+        downloader = AudioDownloader(text, self.source, verify=False)
+        filename = downloader.cached()
+        if filename:
+            return filename
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                sleep(self.backoff * 2 ** (attempt - 1))
+            self.bucket.acquire()
+            try:
+                downloader.download()
+                filename = downloader.cached()
+                if filename:
+                    return filename
+                # Failed downloads may leave no file, or an empty one
+                if exists(downloader.path):
+                    remove(downloader.path)
+                error = IOError('No audio downloaded for {}'.format(text))
+            except NotImplementedError:
+                raise
+            except Exception as e:
+                error = e
+        raise error
+
+    def download_all(self, texts):
+        """Download texts, returning {text: filename} for those that worked."""
+
+        futures = {text: self.submit(text) for text in texts}
+        filenames = {}
+        for text, future in futures.items():
+            try:
+                filenames[text] = future.result()
+            except Exception as e:
+                print('TTS Error: {}'.format(e))
+        return filenames
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
@@ -16,25 +16,46 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
+from functools import lru_cache
+from os.path import dirname, join, realpath
 from re import DOTALL, sub
 from unicodedata import category
 
 from aqt import mw
 from .consts import CLOZE_REGEX
 
+# Files written by the add-on, which Anki keeps across add-on updates
+USER_FILES = join(dirname(realpath(__file__)), 'user_files')
+
+
+@lru_cache(maxsize=1024)
+def _resolve(fields, note_fields):
+    by_name = {}
+    for f in note_fields:
+        by_name.setdefault(f.lower(), []).append(f)
+    return tuple(
+        dict.fromkeys(k for f in fields for k in by_name.get(f.lower(), []))
+    )
+
+
+def resolve_fields(fields, note):
+    """Return the names of the note's fields matching any of fields,
+    ignoring case, ordered by the first of fields they match.
+
+    Resolutions are cached by field group and note type field names, so
+    each group is resolved once per note type, and a changed group or note
+    type is resolved afresh.
+    """
+
+    return _resolve(tuple(fields), tuple(note.keys()))
+
 
 def has_field(field, note):
-    for f in note:
-        if str(field.lower()) == str(f.lower()):
-            return True
-    return False
+    return bool(resolve_fields([field], note))
 
 
 def has_any_field(note, fields):
-    for f in fields:
-        if has_field(f, note):
-            return True
-    return False
+    return bool(resolve_fields(fields, note))
 
 
 def all_fields_empty(note, fields):
@@ -50,19 +71,14 @@ def erase_fields(note, fields):
 
 
 def get_first(fields, note):
-    for f in fields:
-        for k in note:
-            if str(f.lower()) == str(k.lower()):
-                return note[k]
+    for k in resolve_fields(fields, note):
+        return note[k]
     return None
 
 
 def set_all(fields, note, to):
-    fields = [f.lower() for f in fields]
-
-    for f in note.keys():
-        if f.lower() in fields:
-            note[f] = to
+    for f in resolve_fields(fields, note):
+        note[f] = to
 
 
 def cleanup(text):
@@ -132,30 +148,35 @@ def align(a, b):
         return list(zip([None] * len(b), b))
     if not a and not b:
         return []
-    a += [None] * (m - len(a))
-    b += [None] * (m - len(b))
+    a = a + [None] * (m - len(a))
+    b = b + [None] * (m - len(b))
+    punc_a = [is_punc(s) for s in a]
+    punc_b = [is_punc(s) for s in b]
     for _ in range(m):
-        if (is_punc(a[i]) and is_punc(b[j])) or (
-            not is_punc(a[i]) and not is_punc(b[j])
-        ):
+        if punc_a[i] == punc_b[j]:
             done.append((a[i], b[j]))
             i += 1
             j += 1
-        elif is_punc(a[i]) and not is_punc(b[j]):
+        elif punc_a[i]:
             done.append((a[i], None))
             i += 1
-        elif not is_punc(a[i]) and is_punc(b[j]):
+        else:
             done.append((None, b[j]))
             j += 1
     return done
 
 
-def save_note(orig, copy):
+def apply_changes(orig, copy):
     n_changed = 0
     for f in orig.keys():
         if f in copy and copy[f] != orig[f]:
             orig[f] = copy[f]
             n_changed += 1
+    return n_changed
+
+
+def save_note(orig, copy):
+    n_changed = apply_changes(orig, copy)
     mw.col.update_note(orig)
     return n_changed
 
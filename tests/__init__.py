@@ -41,6 +41,7 @@ modules = {
     'anki.utils': MagicMock(),
     'aqt': MagicMock(),
     'aqt.editor': MagicMock(),
+    'aqt.operations': MagicMock(),
     'aqt.utils': MagicMock(),
     'aqt.qt': MagicMock(),
 }
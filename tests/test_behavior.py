@@ -19,18 +19,24 @@
 from unittest.mock import MagicMock, patch
 
 from chinese.behavior import (
+    FillContext,
     fill_all_defs,
     fill_all_rubies,
     fill_classifiers,
     fill_color,
     fill_def,
+    fill_silhouette,
     fill_simp,
     fill_sound,
     fill_trad,
     fill_transcript,
+    fill_usage,
+    plan_fills,
     reformat_transcript,
     update_fields,
 )
+from chinese.hanzi import split_hanzi
+from chinese.transcribe import transcribe
 from tests import Base
 
 
@@ -331,6 +337,74 @@ class UpdateFields(Base):
             m.assert_not_called()
 
 
+class SharedContext(Base):
+    def fill(self, ctx=None):
+        note = dict.fromkeys(
+            [
+                'Hanzi',
+                'Pinyin',
+                'Bopomofo',
+                'Hanzi (Color)',
+                'Ruby (Pinyin)',
+                'Ruby (Bopomofo)',
+            ],
+            '',
+        )
+        fill_transcript('床单', note, ctx)
+        fill_color('床单', note, ctx)
+        fill_all_rubies('床单', note, ctx)
+        return note
+
+    def test_computed_once(self):
+        with patch(
+            'chinese.behavior.split_hanzi', wraps=split_hanzi
+        ) as split, patch(
+            'chinese.behavior.transcribe', wraps=transcribe
+        ) as trans:
+            self.fill(FillContext('床单'))
+        self.assertEqual(split.call_count, 2)
+        self.assertEqual(trans.call_count, 2)
+
+    def test_same_result(self):
+        self.assertEqual(self.fill(FillContext('床单')), self.fill())
+
+
+class PlanFills(Base):
+    def test_only_output_fields(self):
+        fields = ['Hanzi', 'Silhouette', 'Usage']
+        self.assertEqual(
+            plan_fills('hanzi', fields, fields),
+            [fill_silhouette, fill_usage],
+        )
+
+    def test_inputs(self):
+        note_fields = ['Hanzi', 'Pinyin', 'Hanzi (Color)']
+        self.assertEqual(
+            plan_fills('hanzi', note_fields, ['Hanzi (Color)']),
+            [fill_transcript, fill_color],
+        )
+        self.assertEqual(
+            plan_fills('hanzi', note_fields, ['Pinyin']), [fill_transcript]
+        )
+
+    def test_cached(self):
+        fields = ['Hanzi', 'Silhouette']
+        self.assertIs(
+            plan_fills('hanzi', fields, fields),
+            plan_fills('hanzi', list(fields), fields),
+        )
+
+    def test_skips_unreachable_work(self):
+        note = {'Hanzi': '床单', 'Silhouette': ''}
+        with patch('chinese.behavior.split_hanzi') as split, patch(
+            'chinese.behavior.transcribe'
+        ) as trans:
+            update_fields(note, 'Hanzi', list(note))
+        split.assert_not_called()
+        trans.assert_not_called()
+        self.assertEqual(note['Silhouette'], '_ _')
+
+
 class FillAllRubies(Base):
     def test_words(self):
         note = dict.fromkeys(
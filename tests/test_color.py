@@ -44,6 +44,21 @@ class TestColorize(Base):
             '<span class="tone3">你[nǐ]</span>',
         )
 
+    def test_ruby_then_plain(self):
+        self.assertEqual(
+            colorize(['你[nǐ] hǎo'], ruby_whole=True),
+            '<span class="tone3">你[nǐ]</span>'
+            '<span class="tone3">hǎo</span>',
+        )
+
+    def test_ruby_unspaced(self):
+        self.assertEqual(
+            colorize(['你[nǐ]好[hǎo]们[men]']),
+            '你[<span class="tone3">nǐ</span>]'
+            '好[<span class="tone3">hǎo</span>]'
+            '们[<span class="tone5">men</span>]',
+        )
+
     def test_bopomofo(self):
         self.assertEqual(
             colorize(['ㄊㄨˊ', 'ㄕㄨ', 'ㄍㄨㄢˇ'], 'bopomofo'),
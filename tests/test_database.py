@@ -16,7 +16,15 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
-from chinese.database import Dictionary as D
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from os.path import join
+from sqlite3 import OperationalError, connect
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest.mock import patch
+
+from chinese.database import Dictionary as D, LRUCache, PrefixIndex
 from tests import Base
 
 
@@ -42,3 +50,198 @@ class Dictionary(Base):
 
     def test_jyutping(self):
         self.assertEqual(D().get_cantonese('上海人', 'trad'), 'soeng6 hoi2 jan4')
+
+
+class DictionaryBatch(Base):
+    def test_classifiers(self):
+        self.assertEqual(
+            D().get_classifiers_batch(['猫', '思想', 'foo', '']),
+            {'猫': ['隻|只[zhi1]'], '思想': ['個|个[ge4]'], 'foo': []},
+        )
+
+    def test_variants(self):
+        self.assertEqual(D().get_variants_batch(['陵夷']), {'陵夷': ['凌夷']})
+
+    def test_matches_single_lookups(self):
+        d = D()
+        words = ['上海', '猫', '筷子', '陵夷', 'foo']
+        for lang in ['en', 'de', 'fr']:
+            batch = d.get_definitions_batch(words, lang)
+            for word in words:
+                self.assertCountEqual(batch[word], d.get_definitions(word, lang))
+        batch = d.get_sentences_batch(words)
+        for word in words:
+            self.assertEqual(batch[word], d.get_sentences(word))
+        for type_ in ['simp', 'trad']:
+            batch = d.get_pinyin_batch(words, type_)
+            for word in words:
+                self.assertEqual(batch[word], d.get_pinyin(word, type_))
+
+    def test_prefetch(self):
+        d = D()
+        d.prefetch(['猫'])
+        with patch.object(d, 'execute', side_effect=AssertionError):
+            self.assertEqual(d.get_classifiers('猫'), ['隻|只[zhi1]'])
+        d.clear_prefetched()
+        self.assertEqual(d.prefetched, {})
+
+
+class Segmentation(Base):
+    def test_longest_match(self):
+        index = PrefixIndex({'上海': 1, '上海人': 2, '海': 3, '人民': 4})
+        self.assertEqual(index.longest_match('上海人民'), '上海人')
+        self.assertEqual(index.longest_match('上海人民', 3), None)
+        self.assertEqual(index.longest_match('上海人民', 1), '海')
+        self.assertEqual(index.longest_match('上海人民', 1, min_len=2), None)
+        self.assertEqual(index.longest_match('上海人民', max_len=2), '上海')
+        self.assertEqual(
+            index.longest_match('上海人民', accept=lambda v: v != 2), '上海'
+        )
+
+    def test_get(self):
+        index = PrefixIndex({'上海': 1})
+        self.assertEqual(index.get('上海'), 1)
+        self.assertEqual(index.get('上'), None)
+        self.assertEqual(index.get('上海人'), None)
+
+    def test_sentence(self):
+        self.assertEqual(D().get_pinyin('上海人很好', 'simp'), 'shàng hǎi rén hěn hǎo')
+        self.assertEqual(D().get_traditional('上海图书馆'), '上海圖書館')
+
+    def test_skips_variants(self):
+        self.assertEqual(D()._get_word_pinyin('一併', 'trad'), 'yī bìng')
+        self.assertIsNone(D()._get_word_pinyin('一並', 'trad'))
+
+    def test_skips_variants_without_flags(self):
+        # Databases built before update.py added the is_variant column
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        d = D()
+        path = join(tmp.name, 'chinese.db')
+        with closing(connect(path)) as conn:
+            conn.execute('ATTACH ? AS src', (d.db_path,))
+            conn.execute(
+                'CREATE TABLE cidian AS SELECT traditional, simplified, '
+                'pinyin, pinyin_tw, english, german, french FROM src.cidian '
+                "WHERE traditional IN ('一併', '一並')"
+            )
+            conn.commit()
+        d.db_path = path
+        self.addCleanup(d.close)
+        self.assertEqual(d._get_word_pinyin('一併', 'trad'), 'yī bìng')
+        self.assertIsNone(d._get_word_pinyin('一並', 'trad'))
+
+
+class QueryPlans(Base):
+    def plans(self, lookups):
+        d = D()
+        statements = []
+        d.conn.set_trace_callback(statements.append)
+        lookups(d)
+        d.conn.set_trace_callback(None)
+        self.assertTrue(statements)
+        for sql in statements:
+            plan = d.conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+            yield sql, [detail for *_, detail in plan]
+
+    def assertIndexOnly(self, lookups):
+        for sql, details in self.plans(lookups):
+            self.assertNotIn('MULTI-INDEX OR', details, sql)
+            cidian = [d for d in details if 'cidian' in d]
+            self.assertTrue(cidian, sql)
+            for detail in cidian:
+                self.assertRegex(
+                    detail, r'^SEARCH (TABLE )?cidian USING (COVERING )?INDEX', sql
+                )
+
+    def test_single_lookups(self):
+        def lookups(d):
+            for lang in ['en', 'de', 'fr']:
+                d.get_definitions('上海', lang)
+            d.get_classifiers('猫')
+            d.get_variants('陵夷')
+            d.get_sentences('上海')
+
+        self.assertIndexOnly(lookups)
+
+    def test_batch_lookups(self):
+        def lookups(d):
+            words = ['上海', '猫', '筷子', '陵夷']
+            d.get_definitions_batch(words, 'en')
+            d.get_classifiers_batch(words)
+            d.get_variants_batch(words)
+            d.get_sentences_batch(words)
+
+        self.assertIndexOnly(lookups)
+
+
+class Cache(Base):
+    def test_eviction(self):
+        cache = LRUCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertNotIn('b', cache)
+        self.assertIn('a', cache)
+        self.assertEqual(len(cache), 2)
+
+    def test_disabled(self):
+        cache = LRUCache(0)
+        cache.put('a', 1)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.get('a'))
+
+    def test_counters(self):
+        d = D()
+        d.get_pinyin('上海', 'simp')
+        d.get_pinyin('上海', 'simp')
+        d.get_pinyin('上海', 'simp', prefer_tw=True)
+        self.assertEqual(d.cache.stats()['hits'], 1)
+        self.assertEqual(d.get_classifiers('猫'), d.get_classifiers('猫'))
+        self.assertEqual(d.cache.stats()['hits'], 2)
+
+    def test_invalidate(self):
+        d = D()
+        d.get_traditional('上海图书馆')
+        self.assertTrue(d.cache)
+        d.invalidate()
+        self.assertEqual(
+            d.cache.stats(),
+            {'hits': 0, 'misses': 0, 'size': 0, 'maxsize': d.cache.maxsize},
+        )
+        self.assertIsNone(d.index)
+
+
+class Threads(Base):
+    def test_connection_per_thread(self):
+        d = D()
+        self.assertEqual(d.connections, {})
+        d.connect()
+        result = {}
+
+        def lookup():
+            result['classifiers'] = d.get_classifiers('猫')
+
+        thread = Thread(target=lookup)
+        thread.start()
+        thread.join()
+        self.assertEqual(result['classifiers'], ['隻|只[zhi1]'])
+        self.assertEqual(len(d.connections), 2)
+        d.close()
+        self.assertEqual(d.connections, {})
+
+    def test_concurrent_lookups(self):
+        words = ['上海', '猫', '筷子', '陵夷', '图书馆', '人民'] * 20
+        d = D(cache_size=0)
+        expected = [d.get_definitions(w, 'en') for w in words]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            got = list(pool.map(lambda w: d.get_definitions(w, 'en'), words))
+        self.assertEqual(got, expected)
+        d.close()
+
+    def test_read_only(self):
+        d = D()
+        with self.assertRaises(OperationalError):
+            d.execute('DELETE FROM cidian')
+        d.close()
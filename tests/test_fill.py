@@ -0,0 +1,177 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+from unittest.mock import MagicMock, Mock, patch
+
+from chinese.fill import (
+    bulk_fill_sound,
+    bulk_fill_transcript,
+    fill_notes,
+)
+from tests import Base
+
+
+class Note(dict):
+    pass
+
+
+class FillNotes(Base):
+    def setUp(self):
+        super().setUp()
+        self.notes = {
+            nid: Note({'Hanzi': hanzi, 'Pinyin': ''})
+            for nid, hanzi in enumerate(['我', '', '你', '他', ''])
+        }
+        self.col = Mock()
+        self.col.get_note = self.notes.__getitem__
+        self.progress = Mock()
+        self.progress.want_cancel.return_value = False
+        patcher = patch('chinese.fill.mw.progress', self.progress)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def fill(self, i, copy):
+        if copy['Hanzi']:
+            copy['Pinyin'] = 'pinyin %d' % i
+
+    def test_writes_changed_notes_in_chunks(self):
+        changes, n = fill_notes(
+            self.col, list(self.notes), self.fill, 'Fill', chunk_size=2
+        )
+        self.assertEqual(n, 3)
+        written = [c.args[0] for c in self.col.update_notes.call_args_list]
+        self.assertEqual(
+            written,
+            [[self.notes[0]], [self.notes[2], self.notes[3]]],
+        )
+        self.assertEqual(self.notes[3]['Pinyin'], 'pinyin 3')
+        self.col.update_note.assert_not_called()
+
+    def test_single_undo_entry(self):
+        changes, _ = fill_notes(
+            self.col, list(self.notes), self.fill, 'Fill', chunk_size=2
+        )
+        self.col.add_custom_undo_entry.assert_called_once_with('Fill')
+        entry = self.col.add_custom_undo_entry.return_value
+        self.assertEqual(
+            self.col.merge_undo_entries.call_args_list,
+            [((entry,),)] * 2,
+        )
+        self.assertEqual(changes, self.col.merge_undo_entries.return_value)
+
+    def test_nothing_changed(self):
+        _, n = fill_notes(self.col, list(self.notes), lambda i, copy: None, 'Fill')
+        self.assertEqual(n, 0)
+        self.col.update_notes.assert_not_called()
+        self.col.merge_undo_entries.assert_called_once()
+
+    def test_cancel_keeps_filled_notes(self):
+        self.progress.want_cancel.side_effect = [False, False, False, True]
+        _, n = fill_notes(
+            self.col, list(self.notes), self.fill, 'Fill', chunk_size=2
+        )
+        self.assertEqual(n, 2)
+        written = [c.args[0] for c in self.col.update_notes.call_args_list]
+        self.assertEqual(written, [[self.notes[0]], [self.notes[2]]])
+        self.assertEqual(self.notes[3]['Pinyin'], '')
+
+    @patch('chinese.fill.PROGRESS_INTERVAL', 1)
+    @patch('chinese.fill.update_progress')
+    @patch('chinese.fill.monotonic')
+    def test_throttled_progress(self, monotonic, update_progress):
+        monotonic.side_effect = [10, 10.5, 11, 11.5, 12]
+        label = Mock(return_value='label')
+        fill_notes(self.col, list(self.notes), self.fill, 'Fill', label=label)
+        self.assertEqual(
+            [c.args[1] for c in update_progress.call_args_list], [0, 2, 4]
+        )
+        self.assertEqual(label.call_count, 3)
+
+
+class BulkFill(Base):
+    """Run the per-note fill of bulk fills over notes of a collection."""
+
+    def setUp(self):
+        super().setUp()
+        self.notes = {
+            0: Note({'Hanzi': '你好', 'Sound': '', 'Pinyin': ''}),
+            1: Note({'Front': '你好', 'Back': ''}),
+        }
+        self.col = Mock()
+        self.col.get_note = self.notes.__getitem__
+        progress = Mock()
+        progress.want_cancel.return_value = False
+        self.showInfo = Mock()
+        for target, value in [
+            ('chinese.fill.askUser', Mock(return_value=True)),
+            ('chinese.fill.showInfo', self.showInfo),
+            ('chinese.fill.mw.col.find_notes', Mock(return_value=[0, 1])),
+            ('chinese.fill.mw.progress', progress),
+            ('chinese.fill.run_fill', self.run_fill),
+        ]:
+            patcher = patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_fill(self, note_ids, fill, undo_name, done, **kwargs):
+        _, n_updated = fill_notes(
+            self.col, note_ids, fill, undo_name, **kwargs
+        )
+        done(n_updated)
+
+    @patch('chinese.fill.DownloadScheduler', MagicMock())
+    @patch('chinese.fill.get_audio_index', Mock())
+    @patch('chinese.fill.fill_sound')
+    def test_sound(self, fill_sound):
+        fill_sound.return_value = (1, 0)
+        bulk_fill_sound()
+        fill_sound.assert_called_once()
+        hanzi, copy = fill_sound.call_args.args
+        self.assertEqual(hanzi, '你好')
+        self.assertEqual(copy['Sound'], '')
+
+    def bulk_fill_sound(self, filenames):
+        scheduler = MagicMock()
+        scheduler.return_value.__enter__.return_value.download_all.return_value = (
+            filenames
+        )
+        with patch('chinese.fill.DownloadScheduler', scheduler), patch(
+            'chinese.fill.get_audio_index', Mock()
+        ), patch('chinese.sound.AudioDownloader') as downloader:
+            bulk_fill_sound()
+        downloader.assert_not_called()
+
+    def test_sound_downloaded(self):
+        self.bulk_fill_sound({'你好': '你好.mp3'})
+        self.assertEqual(self.notes[0]['Sound'], '[sound:你好.mp3]')
+        self.assertIn('1 new pronunciations', self.showInfo.call_args.args[0])
+
+    def test_sound_failed(self):
+        self.bulk_fill_sound({})
+        self.assertEqual(self.notes[0]['Sound'], '')
+        self.assertIn('1 downloads failed', self.showInfo.call_args.args[0])
+
+    @patch('chinese.fill.fill_all_rubies')
+    @patch('chinese.fill.fill_transcript')
+    def test_transcript(self, fill_transcript, fill_all_rubies):
+        fill_transcript.return_value = 1
+        bulk_fill_transcript()
+        fill_transcript.assert_called_once()
+        fill_all_rubies.assert_called_once()
+        hanzi, copy, _ = fill_transcript.call_args.args
+        self.assertEqual(hanzi, '你好')
+        self.assertEqual(copy['Pinyin'], '')
@@ -25,3 +25,23 @@ class Frequency(Base):
             get_frequency('上海'),
             '<div class="freq freq-very-basic">very basic</div>',
         )
+
+    def test_giga_corpus(self):
+        self.assertEqual(
+            get_frequency('的', 'giga-zh'),
+            '<div class="freq freq-very-basic">very basic</div>',
+        )
+
+    def test_unknown(self):
+        self.assertEqual(
+            get_frequency('不存在的词'),
+            '<div class="freq freq-unknown">unknown</div>',
+        )
+        self.assertEqual(
+            get_frequency(None),
+            '<div class="freq freq-unknown">unknown</div>',
+        )
+
+    def test_bogus_corpus(self):
+        with self.assertRaises(NotImplementedError):
+            get_frequency('上海', 'foo')
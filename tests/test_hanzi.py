@@ -15,8 +15,14 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
+from os.path import exists
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
 from chinese.hanzi import (
     has_hanzi,
+    load_segmenter,
+    segmenter_cache,
     split_hanzi,
     get_silhouette,
     get_simp,
@@ -96,3 +102,34 @@ class SplitHanzi(Base):
 
     def test_mixed_english_chinese(self):
         self.assertEqual(split_hanzi('Brian的'), ['Brian', '的'])
+
+
+class LoadSegmenter(Base):
+    def setUp(self):
+        super().setUp()
+        self.dt = dt = load_segmenter()
+        state = (dt.FREQ, dt.total, dt.initialized)
+
+        def restore():
+            dt.FREQ, dt.total, dt.initialized = state
+
+        self.addCleanup(restore)
+        tmp = TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        patcher = patch('chinese.hanzi.USER_FILES', tmp.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cache_reused(self):
+        self.dt.initialized = False
+        load_segmenter()
+        self.assertTrue(exists(segmenter_cache()))
+        freq = self.dt.FREQ
+
+        self.dt.initialized = False
+        with patch.object(self.dt, 'gen_pfdict') as gen_pfdict:
+            load_segmenter()
+        gen_pfdict.assert_not_called()
+        self.assertTrue(self.dt.initialized)
+        self.assertEqual(self.dt.FREQ, freq)
+        self.assertEqual(split_hanzi('我是学生'), ['我', '是', '学生'])
@@ -0,0 +1,73 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+from random import Random
+from re import IGNORECASE, fullmatch
+
+from chinese.consts import JYUTPING_REGEX, PINYIN_REGEX, PINYIN_VOWELS
+from chinese.patterns import JYUTPING_SYLLABLES, PINYIN_SYLLABLES
+from tests import Base
+
+
+class Syllables(Base):
+    def test_pinyin(self):
+        for s in ['ni3', 'hǎo', 'Zhuang4', 'lüè', 'er', "'iang"]:
+            self.assertIn(s, PINYIN_SYLLABLES)
+        for s in ['', '3', 'nihao', 'hao34', "'hao", "'a", 'x']:
+            self.assertNotIn(s, PINYIN_SYLLABLES)
+
+    def test_jyutping(self):
+        for s in ['nei5', 'hou2', 'gwong2', 'm4', "'uk"]:
+            self.assertIn(s, JYUTPING_SYLLABLES)
+        for s in ['nei8', 'gwx', 'zh']:
+            self.assertNotIn(s, JYUTPING_SYLLABLES)
+
+    def test_split(self):
+        self.assertEqual(
+            PINYIN_SYLLABLES.split('zhongguorenmin'),
+            ['zhong', 'guo', 'ren', 'min'],
+        )
+        self.assertEqual(PINYIN_SYLLABLES.split('xiáài'), ['xiá', 'ài'])
+        self.assertEqual(PINYIN_SYLLABLES.split('ni3q'), ['ni3', 'q'])
+        self.assertEqual(
+            JYUTPING_SYLLABLES.split('nei5hou2'), ['nei5', 'hou2']
+        )
+
+    def test_same_as_regex(self):
+        rng = Random(0)
+        alphabet = "abcdefghijklmnopqrstuvwxyzüHZ'15¹⁵" + PINYIN_VOWELS
+        for syllables, pattern in [
+            (PINYIN_SYLLABLES, PINYIN_REGEX),
+            (JYUTPING_SYLLABLES, JYUTPING_REGEX),
+        ]:
+            candidates = [
+                ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 6)))
+                for _ in range(5000)
+            ]
+            candidates += [
+                initial + final + tone
+                for initial in syllables.initials
+                for final in rng.sample(sorted(syllables.finals), 20)
+                for tone in ['', '2']
+            ]
+            candidates += ["'" + s for s in syllables.standalones]
+            for s in candidates:
+                self.assertEqual(
+                    s in syllables,
+                    bool(fullmatch(pattern, s, IGNORECASE)),
+                    repr(s),
+                )
@@ -43,6 +43,17 @@ class Sound(Base):
         self.mock.return_value = mock
         self.assertEqual(sound('图书馆', 'baidu|zh'), '[sound:foo.mp3]')
 
+    def test_downloaded(self):
+        self.assertEqual(
+            sound('图书馆', 'baidu|zh', {'图书馆': 'foo.mp3'}),
+            '[sound:foo.mp3]',
+        )
+        self.mock.assert_not_called()
+
+    def test_not_downloaded(self):
+        self.assertEqual(sound('图书馆', 'baidu|zh', {}), '')
+        self.mock.assert_not_called()
+
     def test_no_hanzi(self):
         with patch('chinese.sound.has_hanzi', Mock(return_value=False)):
             self.assertEqual(sound('foo', 'baidu|zh'), '')
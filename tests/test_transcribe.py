@@ -15,9 +15,12 @@
 # You should have received a copy of the GNU General Public License along with
 # Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
 
+from unicodedata import normalize
 from unittest import skip
 
 from chinese.transcribe import (
+    _accentuate,
+    _get_tone_number_pinyin,
     accentuate,
     get_tone_number_pinyin,
     is_sentence,
@@ -25,6 +28,7 @@ from chinese.transcribe import (
     replace_tone_marks,
     split_transcript,
     tone_number,
+    tone_tables,
     transcribe,
 )
 from tests import Base
@@ -99,6 +103,17 @@ class SplitTranscript(Base):
             split_transcript('chuángdān', 'pinyin'), ['chuáng dān']
         )
 
+    def test_unspaced_sentence(self):
+        self.assertEqual(
+            split_transcript('zhong1guo2ren2min2' * 100, 'pinyin'),
+            [' '.join(['zhong1 guo2 ren2 min2'] * 100)],
+        )
+
+    def test_unmatched_remainder(self):
+        self.assertEqual(
+            split_transcript('haoxyz', 'pinyin'), ['hao xyz']
+        )
+
 
 class Transcribe(Base):
     def test_single_word(self):
@@ -255,6 +270,22 @@ class ToneNumber(Base):
         self.assertEqual(tone_number('ㄋㄜ˙'), '5')
 
 
+class ToneTables(Base):
+    def test_lookups(self):
+        accented, numbered, tones = tone_tables()
+        self.assertEqual(accented['lüe4'], 'lüè')
+        self.assertEqual(numbered['lüè'], 'lüe4')
+        self.assertEqual(tones['hǎo'], '3')
+        self.assertEqual(tones['ma5'], '5')
+
+    def test_same_as_computed(self):
+        accented, numbered, _ = tone_tables()
+        for k, v in accented.items():
+            self.assertEqual(normalize('NFC', _accentuate(k)), v)
+        for k, v in numbered.items():
+            self.assertEqual(_get_tone_number_pinyin(k), v)
+
+
 class IsSentence(Base):
     def test_length(self):
         self.assertFalse(is_sentence('你' * 6))
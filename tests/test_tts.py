@@ -0,0 +1,288 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import listdir, mkdir, remove
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest.mock import patch
+from urllib.parse import parse_qs, urlparse
+
+from chinese.tts import (
+    AudioDownloader,
+    AudioIndex,
+    DownloadScheduler,
+    TokenBucket,
+)
+from tests import Base
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Serve audio for any text, except that texts starting with 坏 always
+    fail and texts starting with 慢 fail the first two times."""
+
+    def do_GET(self):
+        text = parse_qs(urlparse(self.path).query)['text'][0]
+        self.server.requests[text] += 1
+        if text.startswith('坏') or (
+            text.startswith('慢') and self.server.requests[text] <= 2
+        ):
+            self.send_error(500)
+            return
+        body = text.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'audio/mpeg')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class Scheduler(Base):
+    def setUp(self):
+        super().setUp()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.requests = Counter()
+        Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        profile = TemporaryDirectory()
+        self.addCleanup(profile.cleanup)
+        self.media_dir = join(profile.name, 'collection.media')
+        mkdir(self.media_dir)
+
+        for patcher in [
+            patch('chinese.tts.mw.col.media.dir', return_value=self.media_dir),
+            patch.object(
+                AudioDownloader,
+                'baidu_url',
+                'http://127.0.0.1:%d/gettts' % self.server.server_port,
+            ),
+            patch.dict('chinese.tts.RATE_LIMITS', {'baidu': (1000, 1000)}),
+            patch.dict(DownloadScheduler.buckets, clear=True),
+            patch.dict('chinese.tts._audio_indices', clear=True),
+            patch('chinese.tts.USER_FILES', join(profile.name, 'user_files')),
+        ]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def scheduler(self):
+        return DownloadScheduler('baidu|zh', backoff=0)
+
+    def test_download_all(self):
+        texts = ['图书馆', '你好', '猫', '上海']
+        with self.scheduler() as scheduler:
+            filenames = scheduler.download_all(texts)
+        self.assertEqual(
+            filenames, {t: '{}_baidu_zh.mp3'.format(t) for t in texts}
+        )
+        self.assertCountEqual(listdir(self.media_dir), filenames.values())
+
+    def test_dedupe(self):
+        with self.scheduler() as scheduler:
+            futures = [scheduler.submit('你好') for _ in range(10)]
+            self.assertEqual(len(set(futures)), 1)
+            futures[0].result()
+        self.assertEqual(self.server.requests['你好'], 1)
+
+    def test_retry(self):
+        with self.scheduler() as scheduler:
+            filenames = scheduler.download_all(['慢'])
+        self.assertEqual(filenames, {'慢': '慢_baidu_zh.mp3'})
+        self.assertEqual(self.server.requests['慢'], 3)
+
+    def test_give_up(self):
+        with self.scheduler() as scheduler:
+            filenames = scheduler.download_all(['坏', '好'])
+        self.assertEqual(filenames, {'好': '好_baidu_zh.mp3'})
+        self.assertEqual(self.server.requests['坏'], scheduler.retries + 1)
+
+    def test_backoff(self):
+        with patch('chinese.tts.sleep') as sleep:
+            with DownloadScheduler('baidu|zh', backoff=1) as scheduler:
+                scheduler.download_all(['坏'])
+        self.assertEqual([c.args[0] for c in sleep.call_args_list], [1, 2, 4])
+
+    def test_already_downloaded(self):
+        with self.scheduler() as scheduler:
+            scheduler.download_all(['你好'])
+        with self.scheduler() as scheduler:
+            scheduler.download_all(['你好'])
+        self.assertEqual(self.server.requests['你好'], 1)
+
+    def test_no_stats_when_downloaded(self):
+        texts = ['图书馆', '你好', '猫']
+        with self.scheduler() as scheduler:
+            scheduler.download_all(texts)
+        with patch('chinese.tts.stat') as stat, patch(
+            'chinese.tts.exists'
+        ) as exists:
+            with self.scheduler() as scheduler:
+                filenames = scheduler.download_all(texts)
+        self.assertEqual(len(filenames), 3)
+        stat.assert_not_called()
+        exists.assert_not_called()
+
+    def test_refetch_empty(self):
+        open(join(self.media_dir, '你好_baidu_zh.mp3'), 'w').close()
+        with self.scheduler() as scheduler:
+            filenames = scheduler.download_all(['你好'])
+        self.assertEqual(filenames, {'你好': '你好_baidu_zh.mp3'})
+        self.assertEqual(self.server.requests['你好'], 1)
+
+
+class Index(Base):
+    def setUp(self):
+        super().setUp()
+        profile = TemporaryDirectory()
+        self.addCleanup(profile.cleanup)
+        self.media_dir = join(profile.name, 'collection.media')
+        mkdir(self.media_dir)
+        self.user_files = join(profile.name, 'user_files')
+        patcher = patch('chinese.tts.USER_FILES', self.user_files)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.index = AudioIndex(self.media_dir)
+        self.addCleanup(self.index.close)
+
+    def write(self, filename, data=b'audio'):
+        with open(join(self.media_dir, filename), 'wb') as f:
+            f.write(data)
+
+    def downloader(self, text):
+        return AudioDownloader(text, 'baidu|zh', index=self.index)
+
+    def test_key_normalized(self):
+        self.assertEqual(
+            AudioIndex.key(' e\u0301 ', 'google', 'zh-CN'),
+            AudioIndex.key('\u00e9', 'google', 'zh-CN'),
+        )
+
+    def test_persisted(self):
+        self.write('a.mp3')
+        self.assertTrue(self.index.add('a', 'a.mp3'))
+        self.assertEqual(AudioIndex(self.media_dir).get('a'), 'a.mp3')
+
+    def test_in_user_files(self):
+        self.write('a.mp3')
+        self.index.add('a', 'a.mp3')
+        self.assertEqual(len(listdir(self.user_files)), 1)
+        self.assertCountEqual(
+            listdir(dirname(self.media_dir)), ['collection.media', 'user_files']
+        )
+
+    def test_deleted(self):
+        self.write('a.mp3')
+        self.write('b.mp3')
+        self.index.add('a', 'a.mp3')
+        self.index.add('b', 'b.mp3')
+        remove(join(self.media_dir, 'a.mp3'))
+        self.write('b.mp3', b'')
+        self.assertIsNone(self.index.get('a', verify=True))
+        self.assertIsNone(self.index.get('b', verify=True))
+        self.assertIsNone(AudioIndex(self.media_dir).entries.get('a'))
+
+    def test_trusted(self):
+        self.write('a.mp3')
+        self.index.add('a', 'a.mp3')
+        remove(join(self.media_dir, 'a.mp3'))
+        with patch('chinese.tts.stat') as stat:
+            self.assertEqual(self.index.get('a'), 'a.mp3')
+        stat.assert_not_called()
+
+    def test_single_lookup(self):
+        self.write('a_baidu_zh.mp3')
+        self.downloader('a').cached()
+        with patch.object(self.index, 'get', wraps=self.index.get) as get:
+            downloader = self.downloader('a')
+            self.assertEqual(downloader.cached(), 'a_baidu_zh.mp3')
+        get.assert_called_once()
+
+    def test_redownload_deleted(self):
+        self.write('a_baidu_zh.mp3')
+        self.assertEqual(self.downloader('a').cached(), 'a_baidu_zh.mp3')
+        remove(join(self.media_dir, 'a_baidu_zh.mp3'))
+        self.assertIsNone(self.downloader('a').cached())
+
+    def test_close(self):
+        self.write('a.mp3')
+        self.index.add('a', 'a.mp3')
+        self.index.close()
+        self.assertIsNone(self.index.conn)
+        self.assertEqual(AudioIndex(self.media_dir).get('a'), 'a.mp3')
+
+    def test_reject_empty(self):
+        self.write('a.mp3', b'')
+        self.assertFalse(self.index.add('a', 'a.mp3'))
+        self.assertIsNone(self.index.get('a'))
+
+    def test_collision(self):
+        self.write('ab_baidu_zh.mp3')
+        first = self.downloader('a/b')
+        self.assertEqual(first.cached(), 'ab_baidu_zh.mp3')
+        second = self.downloader('ab')
+        self.assertNotEqual(second.path, first.path)
+        self.assertIsNone(second.cached())
+
+    def test_prune(self):
+        self.write('a.mp3')
+        self.write('b.mp3')
+        self.index.add('a', 'a.mp3')
+        self.index.add('b', 'b.mp3')
+        remove(join(self.media_dir, 'a.mp3'))
+        self.write('b.mp3', b'changed')
+        self.assertEqual(self.index.prune(), 2)
+        self.assertIsNone(self.index.get('a'))
+        self.assertIsNone(AudioIndex(self.media_dir).get('b'))
+
+
+class Bucket(Base):
+    def setUp(self):
+        super().setUp()
+        self.now = 0
+        self.slept = []
+
+        def sleep(seconds):
+            self.slept.append(seconds)
+            self.now += seconds
+
+        self.bucket = TokenBucket(2, 3, clock=lambda: self.now, sleep=sleep)
+
+    def test_burst(self):
+        for _ in range(3):
+            self.bucket.acquire()
+        self.assertEqual(self.slept, [])
+
+    def test_rate(self):
+        for _ in range(5):
+            self.bucket.acquire()
+        self.assertEqual(self.slept, [0.5, 0.5])
+
+    def test_refill(self):
+        for _ in range(3):
+            self.bucket.acquire()
+        self.now += 10
+        for _ in range(3):
+            self.bucket.acquire()
+        self.assertEqual(self.slept, [])
@@ -0,0 +1,326 @@
+# Copyright © 2026 agent <agent@local>
+#
+# This file is part of Chinese Support 3.
+#
+# Chinese Support 3 is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by the Free
+# Software Foundation, either version 3 of the License, or (at your option) any
+# later version.
+#
+# Chinese Support 3 is distributed in the hope that it will be useful, but
+# WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or
+# FITNESS FOR A PARTICULAR PURPOSE.  See the GNU General Public License for
+# more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# Chinese Support 3.  If not, see <https://www.gnu.org/licenses/>.
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from importlib.util import find_spec, module_from_spec, spec_from_file_location
+from os import remove
+from os.path import dirname, join, pardir
+from random import Random
+from sqlite3 import connect
+from tempfile import TemporaryDirectory
+from threading import Thread
+from unittest import skipUnless
+from unittest.mock import patch
+
+from tests import Base
+
+UPDATE_PATH = join(
+    dirname(__file__), pardir, 'chinese', 'data', 'db', 'update.py'
+)
+
+
+SOURCES = {
+    'cedict_ts.u8': (
+        '# CC-CEDICT\n'
+        '中國 中国 [Zhong1 guo2] /China/\n'
+        '學生 学生 [xue2 sheng5] /student/\n'
+        '你好 你好 [ni3 hao3] /hello/\n'
+    ),
+    'handedict.u8': '# HanDeDICT\n學生 学生 [xue2 sheng5] /Schüler/\n',
+    'cfdict.u8': '# CFDICT\n你好 你好 [ni3 hao3] /bonjour/\n',
+    'cccanto-webdist.txt': '# CC-Canto\n你好 你好 [ni3 hao3] {nei5 hou2} /hello/\n',
+    'eng_cmn.csv': 'Hello, student.\t你好，学生。\nI love China.\t我爱中国。\n',
+    'ucd.unihan.flat.xml': (
+        '<!-- Unihan -->\n<ucd><repertoire>\n'
+        '<char cp="4F60" kMandarin="nǐ"/>\n'
+        '<char cp="597D" kMandarin="hǎo"/>\n'
+        '</repertoire></ucd>\n'
+    ),
+}
+
+
+def load_update():
+    spec = spec_from_file_location('update', UPDATE_PATH)
+    update = module_from_spec(spec)
+    spec.loader.exec_module(update)
+    return update
+
+
+def use_data_dir(update, data_dir):
+    update.DATA_DIR = data_dir
+    update.DB_PATH = join(data_dir, 'chinese.db')
+    update.LICENSE_PATH = join(data_dir, 'COPYING.txt')
+
+
+class FileHandler(BaseHTTPRequestHandler):
+    """Serve server.body with server.etag, honouring If-None-Match, Range
+    and If-Range."""
+
+    def do_GET(self):
+        body, etag = self.server.body, self.server.etag
+        self.server.requests.append(self.headers)
+
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        start = 0
+        byte_range = self.headers.get('Range')
+        if byte_range and self.headers.get('If-Range', etag) == etag:
+            start = int(byte_range[len('bytes='):].rstrip('-'))
+            if start >= len(body):
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header(
+                'Content-Range',
+                'bytes %d-%d/%d' % (start, len(body) - 1, len(body)),
+            )
+        else:
+            self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body) - start))
+        self.end_headers()
+        # Counted first, as the client may be done before write returns
+        self.server.sent += len(body) - start
+        self.wfile.write(body[start:])
+
+    def log_message(self, *args):
+        pass
+
+
+@skipUnless(find_spec('yaspin'), 'update.py needs yaspin')
+class Fetch(Base):
+    def setUp(self):
+        super().setUp()
+        self.update = load_update()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FileHandler)
+        self.server.requests = []
+        self.server.sent = 0
+        self.serve(Random(0).randbytes(300000), '"v1"')
+        Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        ).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+        data_dir = TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        self.path = join(data_dir.name, 'dict.zip')
+        self.url = 'http://127.0.0.1:%d/dict.zip' % self.server.server_port
+
+    def serve(self, body, etag):
+        self.server.body = body
+        self.server.etag = etag
+
+    def read(self):
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def interrupt(self, size):
+        """Leave a partial download behind, as if the last one stopped."""
+
+        with open(self.path + '.part', 'wb') as f:
+            f.write(self.server.body[:size])
+
+    def test_download(self):
+        self.assertTrue(self.update.fetch(self.url, self.path))
+        self.assertEqual(self.read(), self.server.body)
+
+    def test_unchanged(self):
+        self.update.fetch(self.url, self.path)
+        self.assertFalse(self.update.fetch(self.url, self.path))
+        self.assertEqual(self.server.requests[-1]['If-None-Match'], '"v1"')
+        self.assertEqual(self.server.sent, len(self.server.body))
+
+    def test_changed(self):
+        self.update.fetch(self.url, self.path)
+        self.serve(b'new version', '"v2"')
+        self.assertTrue(self.update.fetch(self.url, self.path))
+        self.assertEqual(self.read(), b'new version')
+
+    def test_resume(self):
+        self.update.fetch(self.url, self.path)
+        self.server.sent = 0
+        self.interrupt(100000)
+
+        self.assertTrue(self.update.fetch(self.url, self.path))
+        self.assertEqual(self.read(), self.server.body)
+        self.assertEqual(self.server.requests[-1]['Range'], 'bytes=100000-')
+        self.assertEqual(self.server.sent, 200000)
+
+    def test_resume_changed(self):
+        self.update.fetch(self.url, self.path)
+        self.interrupt(100000)
+        self.serve(b'new version', '"v2"')
+
+        self.assertTrue(self.update.fetch(self.url, self.path))
+        self.assertEqual(self.read(), b'new version')
+
+    def test_resume_complete(self):
+        self.update.fetch(self.url, self.path)
+        self.interrupt(len(self.server.body))
+
+        self.assertTrue(self.update.fetch(self.url, self.path))
+        self.assertEqual(self.read(), self.server.body)
+
+
+@skipUnless(find_spec('yaspin'), 'update.py needs yaspin')
+class IncrementalUpdate(Base):
+    def setUp(self):
+        super().setUp()
+        self.update = load_update()
+        self.sources = dict(SOURCES)
+        self.data_dir = self.make_data_dir()
+        use_data_dir(self.update, self.data_dir)
+        self.update.populate_all()
+
+    def make_data_dir(self):
+        data_dir = TemporaryDirectory()
+        self.addCleanup(data_dir.cleanup)
+        self.write_sources(data_dir.name)
+        return data_dir.name
+
+    def write_sources(self, data_dir):
+        for filename, contents in self.sources.items():
+            with open(join(data_dir, filename), 'w', encoding='utf-8') as f:
+                f.write(contents)
+
+    def change(self, filename, old, new):
+        self.sources[filename] = self.sources[filename].replace(old, new)
+        self.write_sources(self.data_dir)
+
+    def rows(self, data_dir):
+        """Rows of each table, in rowid order, which lookups depend on."""
+
+        with connect(join(data_dir, 'chinese.db')) as conn:
+            return [
+                conn.execute('SELECT * FROM %s ORDER BY rowid' % table).fetchall()
+                for table in ['cidian', 'hanzi', 'sources']
+            ]
+
+    def rowids(self):
+        with connect(join(self.data_dir, 'chinese.db')) as conn:
+            return dict(conn.execute('SELECT traditional, rowid FROM cidian'))
+
+    def rebuilt_rows(self):
+        """Rows of a database built from scratch from the current sources."""
+
+        data_dir = self.make_data_dir()
+        use_data_dir(self.update, data_dir)
+        self.update.populate_all()
+        use_data_dir(self.update, self.data_dir)
+        return self.rows(data_dir)
+
+    def test_unchanged(self):
+        with patch.object(
+            self.update, 'merge_dictionaries', side_effect=AssertionError
+        ):
+            self.update.update_all()
+
+    def test_changed(self):
+        self.change('cedict_ts.u8', '/hello/', '/hi/')
+        self.change('cedict_ts.u8', '學生 学生 [xue2 sheng5] /student/\n', '')
+        self.change('cedict_ts.u8', '# CC-CEDICT\n', '# CC-CEDICT\n愛 爱 [ai4] /love/\n')
+        self.change('eng_cmn.csv', 'I love', 'We love')
+        self.change('ucd.unihan.flat.xml', 'nǐ', 'ni3')
+        self.update.update_all()
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
+
+    def test_inserted_between(self):
+        # Lookups by simplified form keep the first entry
+        rowids = self.rowids()
+        self.change(
+            'cedict_ts.u8',
+            '學生 学生 [xue2 sheng5] /student/\n',
+            '學生 学生 [xue2 sheng5] /student/\n你好 你好 [ni2 hao3] /hey/\n'
+            '中國 中国 [zhong1 guo2] /middle kingdom/\n',
+        )
+        self.update.update_all()
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
+        self.assertEqual(self.rowids()['學生'], rowids['學生'])
+
+    def test_moved(self):
+        # First seen in HanDeDICT only, then added to CC-CEDICT
+        self.change(
+            'handedict.u8', '# HanDeDICT\n', '# HanDeDICT\n老師 老师 [lao3 shi1] /Lehrer/\n'
+        )
+        self.update.update_all()
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
+        self.change(
+            'cedict_ts.u8', '# CC-CEDICT\n', '# CC-CEDICT\n老師 老师 [lao3 shi1] /teacher/\n'
+        )
+        self.update.update_all()
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
+
+    def test_variant(self):
+        self.change(
+            'cedict_ts.u8',
+            '# CC-CEDICT\n',
+            '# CC-CEDICT\n妳好 妳好 [ni3 hao3] /variant of 你好[ni3 hao3]/\n',
+        )
+        self.update.update_all()
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
+        with connect(join(self.data_dir, 'chinese.db')) as conn:
+            self.assertEqual(
+                conn.execute('SELECT traditional FROM cidian WHERE is_variant').fetchall(),
+                [('妳好',)],
+            )
+
+    def test_writes_changed_rows_only(self):
+        with connect(join(self.data_dir, 'chinese.db')) as conn:
+            conn.executescript(
+                'CREATE TABLE written (traditional TEXT);'
+                'CREATE TRIGGER log_update AFTER UPDATE ON cidian BEGIN '
+                'INSERT INTO written VALUES (new.traditional); END;'
+            )
+        self.change('cedict_ts.u8', '/hello/', '/hi/')
+        self.update.update_all()
+        with connect(join(self.data_dir, 'chinese.db')) as conn:
+            written = conn.execute('SELECT * FROM written').fetchall()
+        self.assertEqual(written, [('你好',)])
+
+    def test_removed(self):
+        self.change('cedict_ts.u8', '中國 中国 [Zhong1 guo2] /China/\n', '')
+        self.change('ucd.unihan.flat.xml', '<char cp="597D" kMandarin="hǎo"/>\n', '')
+        self.update.update_all()
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
+
+    def test_rematch_changed_sentences_only(self):
+        self.change('eng_cmn.csv', 'I love', 'We love')
+        with patch.object(
+            self.update,
+            'find_usage_sentences',
+            wraps=self.update.find_usage_sentences,
+        ) as find_usage_sentences:
+            self.update.update_all()
+        (entries, *_), _ = find_usage_sentences.call_args
+        self.assertEqual([e['simplified'] for e in entries], ['中国'])
+
+    def test_rematch_without_previous_corpus(self):
+        self.change('eng_cmn.csv', 'I love', 'We love')
+        remove(self.update.get_previous_corpus_path())
+        with patch.object(
+            self.update,
+            'find_usage_sentences',
+            wraps=self.update.find_usage_sentences,
+        ) as find_usage_sentences:
+            self.update.update_all()
+        (entries, *_), _ = find_usage_sentences.call_args
+        self.assertEqual(len(entries), 3)
+        self.assertEqual(self.rows(self.data_dir), self.rebuilt_rows())
@@ -26,6 +26,7 @@ from chinese.util import (
     has_any_field,
     hide,
     no_hidden,
+    resolve_fields,
     save_note,
     set_all,
 )
@@ -92,6 +93,19 @@ class GetFirst(Base):
         self.assertEqual(get_first(['baz', 'foo'], note), 'qux')
 
 
+class ResolveFields(Base):
+    def test_case_and_order(self):
+        note = {'Pinyin': '', 'Hanzi': '', 'READING': ''}
+        self.assertEqual(
+            resolve_fields(['reading', 'pinyin'], note), ('READING', 'Pinyin')
+        )
+
+    def test_changed_note_type(self):
+        self.assertEqual(resolve_fields(['foo'], {'foo': ''}), ('foo',))
+        self.assertEqual(resolve_fields(['foo'], {'Foo': ''}), ('Foo',))
+        self.assertEqual(resolve_fields(['foo'], {'bar': ''}), ())
+
+
 class Align(Base):
     def test_align(self):
         self.assertEqual(